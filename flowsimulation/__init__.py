@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""flowsimulation
+Setup course model and simulate with a number of teams.
+Output waiting times and completion times.
+
+Importing the package has no side effects. Run a simulation with simulate() or from the
+command line with python -m flowsimulation. Race parameters (start times, speeds, tEnd)
+are module settings in flowsimulation.model"""
+
+from .model import Activity, Choice, Team, setupModel, compileRoute, startTeams, teamTypes, scenarioParameters
+from .courses import loadCourse, syntheticCourse
+from .results import (SimulationResults, OnlineResults, P2Quantiles, RunningStats, ResultCache, loadResults,
+                      ResultStore, StoredResults)
+from .sampling import runSeeds, drawRandomInputs, samplingSchemes
+from .engines import engines, runNumpy, runDynamic, stationOrder, Checkpoint
+from .report import (formatTime, printCourse, plotActivityStats, printSweep, printEstimate, printProfile,
+                     printUtilization, printForecast, printOptimization)
+from .analytic import analyticEstimate
+from .profiling import Profile
+from .trace import TraceWriter, Trace
+from .forecasting import Forecaster, readCheckIns
+from .runner import (runSimulations, runBatch, runCached, runUntilConverged, parameterGrid, sweep,
+                     compareRouting, estimate, forecastRace, simulate)
+from .optimize import optimizeStart, startSpace
+from .distributed import WorkQueue, runDistributed, runWorker
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Analytic estimate of the queues at the activities, in milliseconds and without simulation.
+Each activity is an M/G/c queue (Allen-Cunneen approximation) with a time-varying arrival rate
+that follows from the start times and the speed distribution of the teams"""
+
+import math
+import numpy
+from .engines import stationOrder
+
+# Probability that an arrival has to wait in an M/M/c queue with offered loads a = lambda / mu (array)
+def erlangC(c, a):
+    a = numpy.minimum(a, c * (1 - 1e-9))
+    erlangB = numpy.ones_like(a)
+    for k in range(1, c + 1):
+        erlangB = a * erlangB / (k + a * erlangB)
+    return erlangB / (1 - a / c * (1 - erlangB))
+
+# Allen-Cunneen approximation of the mean wait in a G/G/c queue, for arrival rates below c / serviceMean,
+# with squared coefficients of variation ca2 and cs2 of the interarrival and service times
+def allenCunneen(c, arrivalRates, serviceMean, ca2, cs2):
+    return erlangC(c, arrivalRates * serviceMean) / (c / serviceMean - arrivalRates) * (ca2 + cs2) / 2
+
+def analyticEstimate(Teams, Activities, resolution=1.0, maxUtilization=0.9):
+    """Approximate load and waiting per activity, in Activities order, as dicts with
+    teams (no. of visiting teams), arrivalRate (teams per hour at the busiest time), utilization
+    (at the busiest time), wait (mean wait in minutes), maxWait (wait at the busiest time),
+    open and close (expected times of the first arrival and the last departure) and saturated
+    (more teams arrive than the activity can serve, so a queue builds up regardless of chance).
+
+    A team arrives at an activity after walking distance D at speed v ~ N(speedDistribution()),
+    so its arrival time has the density of D / v, shifted by its start time and the expected
+    durations and waits upstream. The arrival rate over time is the sum of these densities, on
+    a grid of resolution minutes. The wait at time t is the fluid queue (teams in excess of the
+    capacity) plus the M/G/c (Allen-Cunneen) wait at the arrival rate at t, with the utilization
+    capped at maxUtilization since the peaks are too short for a queue to settle"""
+    Teams = sorted(Teams, key=lambda t: t.index)
+    speedDistributions = numpy.array([t.speedDistribution() for t in Teams]).reshape(-1, 2) / 60 # km per minute
+    means, stdevs = speedDistributions[:, 0], speedDistributions[:, 1]
+    shifts = numpy.array([t.startTime for t in Teams], dtype=float) # Start plus expected durations and waits
+    walked = numpy.zeros(len(Teams))
+
+    visits = [[] for a in Activities]
+    for n, t in enumerate(Teams):
+        for distance, a in t.route:
+            if a is not None:
+                visits[a.index].append((n, distance))
+
+    estimates = [None] * len(Activities)
+    for i in stationOrder(Teams, Activities):
+        a = Activities[i]
+        estimate = {"activity": a, "teams": len(visits[i]), "arrivalRate": 0.0, "utilization": 0.0, "wait": 0.0,
+                    "maxWait": 0.0, "open": None, "close": None, "saturated": False}
+        estimates[i] = estimate
+        if not visits[i]:
+            continue
+        teamNos = numpy.array([n for n, distance in visits[i]])
+        walked[teamNos] += numpy.array([distance for n, distance in visits[i]])
+        D, m, s = walked[teamNos], means[teamNos], stdevs[teamNos]
+        if a.minDuration is None:
+            serviceMean = serviceVariance = 0.0
+        else:
+            serviceMean = (a.minDuration + a.maxDuration) / 2
+            serviceVariance = (a.maxDuration - a.minDuration) ** 2 / 12
+
+        # Arrival densities (teams per minute) on the grid. Teams that have not walked yet, or whose
+        # speed is known exactly (stdev 0), arrive at a fixed time, spread over the grid
+        first = (shifts[teamNos] + D / (m + 4 * s)).min() - resolution
+        last = (shifts[teamNos] + D / numpy.maximum(m - 4 * s, m / 4)).max() + resolution
+        times = numpy.arange(first, last + resolution, resolution)
+        walking = numpy.maximum(times[:, None] - shifts[teamNos], 1e-9) # Walking time, if arriving at t
+        speeds = D / walking
+        fixed = (D == 0) | (s == 0)
+        spread = numpy.where(fixed, 1.0, s)
+        densities = (numpy.exp(-0.5 * ((speeds - m) / spread) ** 2) / (spread * math.sqrt(2 * math.pi))
+                     * speeds / walking)
+        arrivals = shifts[teamNos][fixed] + D[fixed] / m[fixed]
+        densities[:, fixed] = numpy.exp(-0.5 * ((times[:, None] - arrivals) / resolution) ** 2) / (
+            resolution * math.sqrt(2 * math.pi))
+        densities /= numpy.maximum(densities.sum(axis=0) * resolution, 1e-12) # Each team arrives once
+        rates = densities.sum(axis=1)
+        estimate["open"] = float(times[numpy.searchsorted(numpy.cumsum(rates) * resolution, 0.5)])
+        peak = rates.argmax()
+        estimate["arrivalRate"] = float(rates[peak] * 60)
+
+        waits = numpy.zeros_like(times)
+        if serviceMean:
+            c = a.capacity
+            serviceRate = c / serviceMean # Teams per minute
+            estimate["utilization"] = float(rates[peak] / serviceRate)
+            present = 0.0 # Teams in service or queueing, as a fluid
+            queue = numpy.zeros_like(times)
+            for k, rate in enumerate(rates):
+                present = max(0.0, present + (rate - min(present, c) / serviceMean) * resolution)
+                queue[k] = max(0.0, present - c)
+            # Arrivals are random on the time scale of a visit only once the spread of the team has grown to it
+            spreads = numpy.minimum(1.0, (D * s / m ** 2 / serviceMean) ** 2)
+            ca2 = densities @ spreads / numpy.maximum(rates, 1e-12)
+            waits = queue / serviceRate + allenCunneen(c, numpy.minimum(rates, maxUtilization * serviceRate),
+                                                       serviceMean, ca2, serviceVariance / serviceMean ** 2)
+            estimate["saturated"] = bool(queue.max() >= 1)
+        estimate["wait"] = float((rates * waits).sum() / rates.sum())
+        estimate["maxWait"] = float(waits.max())
+        teamWaits = (densities * waits[:, None]).sum(axis=0) * resolution
+        shifts[teamNos] += teamWaits + serviceMean
+        # The last team leaves when the expected number of teams still to arrive drops below a half
+        remaining = len(teamNos) - numpy.cumsum(rates) * resolution
+        lastArrival = times[min(numpy.searchsorted(-remaining, -0.5), len(times) - 1)]
+        estimate["close"] = float(lastArrival + waits[-1] + serviceMean)
+    return estimates
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Scaling benchmarks: python -m flowsimulation.benchmark --help
+
+Times simulate() on synthetic linear courses (see syntheticCourse()) along four axes from a base
+case: runs, teams, stations, team types and workers, for each engine. The timings are written to a JSON file
+and compared with a baseline from an earlier run on the same machine. The exit status is 1 if a
+case got slower than the baseline by more than the threshold"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy
+from .courses import syntheticCourse
+from .model import teamTypes, scenarioParameters
+from .profiling import Profile
+from .runner import simulate
+
+# Runs of the base case per engine. The engines differ about 100 times in speed
+baseRuns = {"simpy": 10, "heap": 50, "numpy": 500}
+
+def benchmarkCases(engineNames=("simpy", "heap", "numpy"), quick=False):
+    """Cases as dicts with engine, runs, teams, stations, teamTypes and workers. Each axis is varied on
+    its own from the base case of 61 teams, 22 stations, the 3 built-in team types and 1 worker"""
+    axes = {"runs": [1, 4], "teams": [61, 200, 500], "stations": [10, 22, 60], "teamTypes": [3, 6, 12],
+            "workers": [1, 2, 4]}
+    if quick:
+        axes = {"runs": [1, 2], "teams": [61, 200], "stations": [10, 22], "teamTypes": [3, 6], "workers": [1, 2]}
+    cases = []
+    for engine in engineNames:
+        base = {"engine": engine, "runs": baseRuns[engine], "teams": 61, "stations": 22, "teamTypes": len(teamTypes),
+                "workers": 1}
+        for axis, values in axes.items():
+            for value in values:
+                case = dict(base, **{axis: baseRuns[engine] * value if axis == "runs" else value})
+                if case not in cases:
+                    cases.append(case)
+    return cases
+
+def caseName(case):
+    return "%(engine)s-runs%(runs)d-teams%(teams)d-stations%(stations)d-types%(teamTypes)d-workers%(workers)d" % case
+
+# Team types of a case and the course declarations of those after the built-in ones, T4, T5, ...,
+# which take the speeds and group start times of the built-in types in turn
+def caseTeamTypes(noOfTypes):
+    start = scenarioParameters()
+    types = list(teamTypes) + ["T%d" % (k + 1) for k in range(len(teamTypes), noOfTypes)]
+    declarations = {}
+    for k, teamType in enumerate(types[len(teamTypes):]):
+        builtIn = teamTypes[k % len(teamTypes)]
+        declarations[teamType] = {"meanSpeed": start["meanSpeed"][builtIn], "stdevSpeed": start["stdevSpeed"][builtIn],
+                                  "groupStartTime": start["groupStartTimes"][builtIn], "tStartSimul": 1}
+    return types[:noOfTypes], declarations
+
+def runCase(case, repeat=3):
+    """Time simulate() on the synthetic course of a case, best of repeat. The teams are split evenly
+    over the team types (see caseTeamTypes()) and start in 8 groups per type, and the capacity grows with
+    the number of teams, so the load on the posts is like that of the default course. Returns a result row"""
+    types, declarations = caseTeamTypes(case["teamTypes"])
+    noOfTeams = {teamType: case["teams"] // len(types) + (k < case["teams"] % len(types))
+                 for k, teamType in enumerate(types)}
+    overrides = {"teams.%s" % teamType: n for teamType, n in noOfTeams.items()}
+    overrides.update({"tStartSimul.%s" % teamType: max(1, math.ceil(n / 8)) for teamType, n in noOfTeams.items()})
+    course = syntheticCourse(case["stations"], types, capacity=max(2, math.ceil(case["teams"] / 12)), seed=1)
+    if declarations:
+        course["teamTypes"] = declarations
+    with tempfile.TemporaryDirectory() as directory:
+        courseFile = os.path.join(directory, "synthetic.json")
+        with open(courseFile, "w", encoding="utf-8") as f:
+            json.dump(course, f)
+        timings = []
+        for i in range(repeat):
+            profile = Profile()
+            startTime = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                # The team counts are all in overrides
+                simulate(case["runs"], noVTeams=0, noSTeams=0, noOBTeams=0, workers=case["workers"],
+                         engine=case["engine"], overrides=overrides, plot=False, courseName=courseFile,
+                         profile=profile)
+            timings.append((profile.phaseTimes["run"], time.perf_counter() - startTime, profile.events))
+    seconds, total, events = min(timings)
+    return dict(case, name=caseName(case), seconds=seconds, totalSeconds=total,
+                runsPerSecond=case["runs"] / seconds, eventsPerSecond=events / seconds)
+
+def compareWithBaseline(rows, baseline, threshold=0.25):
+    """Ratio of the run time of each row to the baseline row with the same name, as a list of
+    (row, ratio, regressed), where regressed means more than threshold (0.25 = 25%) slower.
+    Rows without a baseline get ratio None"""
+    baselineTimes = {row["name"]: row["seconds"] for row in baseline["results"]}
+    comparison = []
+    for row in rows:
+        ratio = row["seconds"] / baselineTimes[row["name"]] if row["name"] in baselineTimes else None
+        comparison.append((row, ratio, ratio is not None and ratio > 1 + threshold))
+    return comparison
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m flowsimulation.benchmark",
+                                     description="Time simulate() on synthetic courses along runs, teams, stations, "
+                                                 "team types and workers, and compare with a baseline")
+    parser.add_argument("--engine", choices=list(baseRuns), action="append",
+                        help="engine to benchmark (repeatable, default: all)")
+    parser.add_argument("--quick", action="store_true", help="fewer and smaller cases")
+    parser.add_argument("--repeat", type=int, default=3, help="time each case REPEAT times and keep the best")
+    parser.add_argument("--output", default="benchmark.json", help="results file (default: %(default)s)")
+    parser.add_argument("--baseline", default="benchmark-baseline.json",
+                        help="baseline results to compare with (default: %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="fail if a case is more than this fraction slower than the baseline (default: %(default)s)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parseArguments(argv)
+    rows = []
+    print("%-45s %9s %11s %12s %8s" % ("Case", "Run (s)", "Runs/s", "Events/s", "Baseline"))
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = 0
+    for case in benchmarkCases(args.engine or list(baseRuns), args.quick):
+        row = runCase(case, args.repeat)
+        rows.append(row)
+        ratio = regressed = None
+        if baseline is not None:
+            (row, ratio, regressed), = compareWithBaseline([row], baseline, args.threshold)
+            regressions += regressed
+        print("%-45s %9.3f %11.1f %12.0f %8s%s"
+              % (row["name"], row["seconds"], row["runsPerSecond"], row["eventsPerSecond"],
+                 "%.2fx" % ratio if ratio is not None else "-", "  SLOWER" if regressed else ""))
+    results = {"python": platform.python_version(), "numpy": numpy.__version__, "machine": platform.machine(),
+               "processor": platform.processor(), "cpus": os.cpu_count(), "results": rows}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+    print("Wrote %s" % args.output)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+        print("Wrote %s" % args.baseline)
+    if regressions:
+        print("%d case(s) more than %.0f%% slower than %s" % (regressions, args.threshold * 100, args.baseline))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
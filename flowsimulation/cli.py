@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""Command line interface: python -m flowsimulation --help"""
+
+import argparse
+import multiprocessing
+from .results import ResultCache, ResultStore
+from .profiling import Profile
+from .runner import simulate, estimate, forecastRace, compareRouting, parameterGrid, sweep
+from .forecasting import parseTime
+from .sampling import samplingSchemes
+from .report import printSweep, printOptimization
+from .optimize import optimizeStart
+from .distributed import runWorker
+
+# Parse a value of an override as int or float
+def parseNumber(value, text):
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a number in %r" % text) from None
+
+# Parse NAME=VALUE of --set into a setupModel() override, with VALUE as int or float
+def parseOverride(text):
+    name, separator, value = text.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError("expected NAME=VALUE, got %r" % text)
+    return name, parseNumber(value, text)
+
+# Parse NAME=V1,V2,... of --vary into an axis of parameterGrid()
+def parseAxis(text):
+    name, separator, values = text.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError("expected NAME=V1,V2,..., got %r" % text)
+    return name, [parseNumber(value, text) for value in values.split(",")]
+
+# Parse a value of --teams: a count, or TYPE=COUNT as (team type, count)
+def parseTeamCount(text):
+    teamType, separator, count = text.rpartition("=")
+    try:
+        return (teamType, int(count)) if separator else int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected COUNT or TYPE=COUNT, got %r" % text) from None
+
+# Counts of V, S and OB teams and overrides "teams.<type>" for the other team types from --teams,
+# given as three counts of V, S and OB teams or as TYPE=COUNT pairs. Types not in the pairs get no teams
+def teamCounts(parser, values):
+    if all(isinstance(value, int) for value in values):
+        if len(values) != 3:
+            parser.error("--teams takes three counts (V S OB) or TYPE=COUNT pairs")
+        return values[0], values[1], values[2], {}
+    if not all(isinstance(value, tuple) for value in values):
+        parser.error("--teams takes three counts (V S OB) or TYPE=COUNT pairs, not both")
+    counts = dict(values)
+    return (counts.pop("V", 0), counts.pop("S", 0), counts.pop("OB", 0),
+            {"teams.%s" % teamType: count for teamType, count in counts.items()})
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(prog="flowsimulation",
+                                     description="Simulate a scout race and report waiting and completion times")
+    parser.add_argument("--course", default="default",
+                        help="built-in course (default, rute2021, rute2022), .json/.toml course file or .py file "
+                             "with buildCourse() (default: %(default)s)")
+    parser.add_argument("--teams", type=parseTeamCount, nargs="+", default=[27, 14, 20], metavar="COUNT",
+                        help="number of V, S and OB teams, or TYPE=COUNT per team type for courses with other "
+                             "team types, e.g. --teams V=20 R=30 (default: 27 14 20)")
+    parser.add_argument("--runs", type=int, default=50, help="number of runs (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1, help="base seed (default: %(default)s)")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes (default: number of CPUs, 1 with --trace or --cprofile)")
+    parser.add_argument("--engine", choices=["simpy", "heap", "dynamic", "numpy"], default="simpy",
+                        help="simulation engine, dynamic routes teams at the choices of the course by the queues "
+                             "(default: %(default)s)")
+    parser.add_argument("--sampling", choices=samplingSchemes, default="plain",
+                        help="plain, antithetic pairs of runs or Latin hypercube speeds (default: %(default)s)")
+    parser.add_argument("--set", type=parseOverride, action="append", default=[], metavar="NAME=VALUE",
+                        help="change the model, e.g. --set \"capacity.Post 9=5\" (repeatable)")
+    parser.add_argument("--vary", type=parseAxis, action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="compare every combination of the values on the same seeds and print a table, e.g. "
+                             "--vary \"capacity.Post 9=4,5,6\" --vary tStartInterval=10,15 (repeatable)")
+    parser.add_argument("--online", action="store_true", help="keep constant-memory summaries only")
+    parser.add_argument("--batch-size", type=int, default=1000, help="runs per batch with --online, --store or --queue")
+    parser.add_argument("--tolerance", type=float,
+                        help="add runs until percentiles are known within +-TOLERANCE minutes")
+    parser.add_argument("--confidence", type=float, default=0.95, help="confidence level for --tolerance")
+    parser.add_argument("--max-runs", type=int, default=100000, help="upper limit on runs with --tolerance")
+    parser.add_argument("--cache", metavar="DIRECTORY", help="reuse results cached in DIRECTORY")
+    parser.add_argument("--store", metavar="DIRECTORY",
+                        help="append the runs to DIRECTORY in chunks of --batch-size runs, resuming an interrupted "
+                             "batch, and report from it")
+    parser.add_argument("--queue", metavar="DIRECTORY",
+                        help="hand the runs to the workers of the shared DIRECTORY in units of --batch-size runs and "
+                             "report from their results, resuming after the units already done")
+    parser.add_argument("--worker", metavar="DIRECTORY",
+                        help="simulate units from the shared DIRECTORY until its job is finished, and exit")
+    parser.add_argument("--idle-timeout", type=float, metavar="SECONDS",
+                        help="with --worker, also exit after SECONDS without a unit to simulate")
+    parser.add_argument("--output", metavar="FILE",
+                        help="write the plots to FILE-maxqueue.EXT and FILE-gantt.EXT (.png or .svg) instead of showing them")
+    parser.add_argument("--estimate", action="store_true",
+                        help="print the analytic queue estimate per activity and exit without simulating")
+    parser.add_argument("--forecast", metavar="FILE",
+                        help="forecast the rest of the race from the check-ins (team,post,time[,arrive|leave]) in FILE "
+                             "with the numpy engine and --runs runs, and exit")
+    parser.add_argument("--now", type=parseTime, metavar="HH:MM", help="time of the forecast (default: latest check-in)")
+    parser.add_argument("--follow", action="store_true", help="with --forecast, update the forecast when FILE changes")
+    parser.add_argument("--compare-routing", action="store_true",
+                        help="compare the wait and p95 finish with the choices of the course taken in the order given "
+                             "and by the queues (dynamic engine), and exit")
+    parser.add_argument("--optimize-start", action="store_true",
+                        help="search group start times, teams starting at once and start interval for less waiting, "
+                             "earlier finishes and shorter bottleneck queues, with up to --runs runs per candidate, "
+                             "and exit")
+    parser.add_argument("--candidates", type=int, default=64, help="start schedules to screen with --optimize-start")
+    parser.add_argument("--time-limit", type=float, metavar="SECONDS", help="time limit of --optimize-start")
+    parser.add_argument("--objective-weights", type=float, nargs=3, default=[1.0, 2.0, 30.0],
+                        metavar=("WAIT", "FINISH", "QUEUE"),
+                        help="weights of the total wait per run, the p95 finish time and the bottleneck max queue "
+                             "in --optimize-start (default: 1 2 30)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write every enqueue, service start and departure to FILE (runs in one process)")
+    parser.add_argument("--profile", action="store_true",
+                        help="print time per phase, run durations, events per second and peak memory")
+    parser.add_argument("--cprofile", metavar="FILE",
+                        help="write cProfile statistics of the runs to FILE (implies --profile, runs in one process "
+                             "by default)")
+    parser.add_argument("--no-plot", action="store_true", help="print the report only")
+    args = parser.parse_args(argv)
+    args.teams = teamCounts(parser, args.teams)
+    if args.workers is None: # Traces are written and runs profiled by this process only
+        args.workers = 1 if args.trace or args.cprofile else multiprocessing.cpu_count()
+    elif args.trace and args.workers > 1:
+        parser.error("--trace needs --workers 1")
+    return args
+
+def main(argv=None):
+    args = parseArguments(argv)
+    noVTeams, noSTeams, noOBTeams, overrides = args.teams
+    overrides.update(args.set)
+    if args.worker:
+        print("Simulated %d units" % runWorker(args.worker, idleTimeout=args.idle_timeout))
+        return
+    if args.estimate:
+        estimate(noVTeams, noSTeams, noOBTeams, overrides=overrides, courseName=args.course)
+        return
+    if args.compare_routing:
+        printSweep(compareRouting(args.runs, noVTeams, noSTeams, noOBTeams, seed=args.seed, workers=args.workers,
+                                  confidence=args.confidence, overrides=overrides, courseName=args.course,
+                                  sampling=args.sampling))
+        return
+    if args.vary:
+        printSweep(sweep(parameterGrid(dict(args.vary)), args.runs, noVTeams, noSTeams, noOBTeams, seed=args.seed,
+                         workers=args.workers, engine=args.engine, confidence=args.confidence,
+                         courseName=args.course, sampling=args.sampling, queue=args.queue,
+                         unitSize=args.batch_size, overrides=overrides))
+        return
+    if args.optimize_start:
+        printOptimization(optimizeStart(args.runs, noVTeams, noSTeams, noOBTeams, noOfCandidates=args.candidates,
+                                        seed=args.seed, workers=args.workers, timeLimit=args.time_limit,
+                                        waitWeight=args.objective_weights[0], finishWeight=args.objective_weights[1],
+                                        queueWeight=args.objective_weights[2], overrides=overrides,
+                                        courseName=args.course))
+        return
+    if args.forecast:
+        forecastRace(args.forecast, args.runs, noVTeams, noSTeams, noOBTeams, seed=args.seed, overrides=overrides,
+                     courseName=args.course, now=args.now, follow=args.follow)
+        return
+    simulate(args.runs, noVTeams, noSTeams, noOBTeams, workers=args.workers, seed=args.seed, engine=args.engine,
+             online=args.online, batchSize=args.batch_size, tolerance=args.tolerance, confidence=args.confidence,
+             maxRuns=args.max_runs, cache=ResultCache(args.cache) if args.cache else None,
+             overrides=overrides, output=args.output, plot=not args.no_plot, courseName=args.course,
+             sampling=args.sampling,
+             profile=Profile(args.cprofile) if args.profile or args.cprofile else None, trace=args.trace,
+             store=ResultStore(args.store) if args.store else None, queue=args.queue)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Courses. A course file (.json or .toml) lists the stations and the route of each team type:
+
+    {"stations": [{"name": "Startpost", "capacity": 8, "minDuration": 10, "maxDuration": 13}, ...],
+     "routes": {"V": ["Startpost", 1.0, "Post 1", 0.7, ..., "Mål"], "S": [...], "OB": [...]}}
+
+A route alternates station names and the distance in km walked to the next element, like the
+[act1, distance1, act2, distance2, ...] course lists. Stations without a duration (null) are passed
+without delay. The built-in courses are the .json files in this directory.
+
+Instead of a station, a route can hold a choice between branches, where each branch is a station
+name or a route that starts and ends with a station:
+
+    {"anyOrder": ["Post 0A", "Post 0B"], "distance": 3}   visit all, in any order, 3 km apart
+    {"oneOf": [["Post 5A", 0.4, "Post 5B"], "Post 5C"]}    visit one of the branches
+
+The dynamic engine chooses by the queues when a team gets to the choice. The other engines take
+the branches in the order given, see Choice.
+
+Team types other than V, S and OB are declared with their speed and start parameters. They are
+team types of the scenarios on this course only (see scenarioParameters()):
+
+    "teamTypes": {"R": {"meanSpeed": 4.5, "stdevSpeed": 0.5, "groupStartTime": 660, "tStartSimul": 4}}"""
+
+import importlib.util
+import json
+import numbers
+import os
+import random
+
+# Load a course as (activities, course, team types), where course maps each team type to its list
+# [act1, distance1, act2, distance2, ...] and team types holds the parameters of the team types
+# the course declares, {team type: {meanSpeed, stdevSpeed, groupStartTime, tStartSimul}}
+def loadCourse(courseName="default"):
+    """courseName: built-in course ("default", "rute2021", "rute2022"), course file (.json or .toml)
+    or Python file defining buildCourse(), returning (activities, course) or (activities, course,
+    team types)"""
+    if courseName.endswith(".py"):
+        name = os.path.splitext(os.path.basename(courseName))[0]
+        spec = importlib.util.spec_from_file_location(name, courseName)
+        if spec is None:
+            raise ValueError("Cannot load course file: %s" % courseName)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        course = module.buildCourse()
+        return course if len(course) == 3 else (course[0], course[1], {})
+    if courseName.endswith((".json", ".toml")):
+        path = courseName
+    else:
+        path = os.path.join(os.path.dirname(__file__), courseName + ".json")
+        if not os.path.exists(path):
+            raise ValueError("Unknown course: %s" % courseName)
+    return compileCourse(readCourseFile(path), path)
+
+def readCourseFile(path):
+    if path.endswith(".toml"):
+        import tomllib # Python 3.11+
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def validateCourse(description, source="course"):
+    """Check the structure of a course description and raise ValueError naming the first problem"""
+    if not isinstance(description, dict) or "stations" not in description or "routes" not in description:
+        raise ValueError("%s: expected an object with stations and routes" % source)
+    names = set()
+    for i, station in enumerate(description["stations"]):
+        where = "%s: stations[%d]" % (source, i)
+        if not isinstance(station, dict) or not isinstance(station.get("name"), str):
+            raise ValueError("%s: expected an object with a name" % where)
+        if station["name"] in names:
+            raise ValueError("%s: duplicate station %r" % (where, station["name"]))
+        names.add(station["name"])
+        capacity = station.get("capacity")
+        if isinstance(capacity, bool) or not isinstance(capacity, int) or capacity < 1:
+            raise ValueError("%s: capacity must be a positive integer" % where)
+        minDuration, maxDuration = station.get("minDuration"), station.get("maxDuration")
+        if (minDuration is None) != (maxDuration is None):
+            raise ValueError("%s: give both minDuration and maxDuration, or neither" % where)
+        if minDuration is not None:
+            if not all(isinstance(d, numbers.Number) and not isinstance(d, bool) for d in (minDuration, maxDuration)):
+                raise ValueError("%s: durations must be numbers" % where)
+            if not 0 <= minDuration <= maxDuration:
+                raise ValueError("%s: need 0 <= minDuration <= maxDuration" % where)
+    if not isinstance(description["routes"], dict) or not description["routes"]:
+        raise ValueError("%s: routes must map team types to routes" % source)
+    if not isinstance(description.get("teamTypes", {}), dict):
+        raise ValueError("%s: teamTypes must map team types to their parameters" % source)
+    for teamType, parameters in description.get("teamTypes", {}).items():
+        where = "%s: teamTypes.%s" % (source, teamType)
+        if not isinstance(parameters, dict) or set(parameters) != set(teamTypeParameters):
+            raise ValueError("%s: expected an object with %s" % (where, ", ".join(teamTypeParameters)))
+        if not all(isDistance(value) for value in parameters.values()):
+            raise ValueError("%s: parameters must be numbers >= 0" % where)
+        if isinstance(parameters["tStartSimul"], float) or parameters["tStartSimul"] < 1:
+            raise ValueError("%s: tStartSimul must be a positive integer" % where)
+    for teamType, route in description["routes"].items():
+        if not isinstance(route, list) or not route:
+            raise ValueError("%s: routes.%s must be a non-empty list" % (source, teamType))
+        validateRoute(route, names, "%s: routes.%s" % (source, teamType))
+
+# Parameters of a team type in a course file
+teamTypeParameters = ["meanSpeed", "stdevSpeed", "groupStartTime", "tStartSimul"]
+
+def isDistance(element):
+    return isinstance(element, numbers.Number) and not isinstance(element, bool) and element >= 0
+
+def validateRoute(route, names, where):
+    for i, element in enumerate(route):
+        elementWhere = "%s[%d]" % (where, i)
+        if isinstance(element, str):
+            if element not in names:
+                raise ValueError("%s: unknown station %r" % (elementWhere, element))
+        elif isinstance(element, dict):
+            validateChoice(element, names, elementWhere)
+        elif not isDistance(element):
+            raise ValueError("%s: expected a station name, a choice or a distance >= 0" % elementWhere)
+
+def validateChoice(choice, names, where):
+    kinds = [kind for kind in ("anyOrder", "oneOf") if kind in choice]
+    if len(kinds) != 1 or set(choice) - {kinds[0], "distance"}:
+        raise ValueError("%s: expected a choice with anyOrder (and distance) or oneOf" % where)
+    kind = kinds[0]
+    if "distance" in choice and (kind != "anyOrder" or not isDistance(choice["distance"])):
+        raise ValueError("%s: distance must be a number >= 0, with anyOrder" % where)
+    branches = choice[kind]
+    if not isinstance(branches, list) or not branches:
+        raise ValueError("%s: %s must be a non-empty list of branches" % (where, kind))
+    for k, branch in enumerate(branches):
+        branchWhere = "%s.%s[%d]" % (where, kind, k)
+        branch = [branch] if isinstance(branch, str) else branch
+        if not isinstance(branch, list) or not branch or isDistance(branch[0]) or isDistance(branch[-1]):
+            raise ValueError("%s: a branch is a station name or a route starting and ending with a station"
+                             % branchWhere)
+        validateRoute(branch, names, branchWhere)
+
+def compileCourse(description, source="course"):
+    """Validate a course description and build its (activities, course, team types)"""
+    from ..model import Activity # The model imports this package
+    validateCourse(description, source)
+    Activities = [Activity(s["capacity"], s.get("minDuration"), s.get("maxDuration"), s["name"])
+                  for s in description["stations"]]
+    activityByName = {a.name: a for a in Activities}
+    course = {teamType: compileElements(route, activityByName)
+              for teamType, route in description["routes"].items()}
+    return Activities, course, {teamType: dict(parameters)
+                                for teamType, parameters in description.get("teamTypes", {}).items()}
+
+# Course list of a validated route: station names become activities and choices Choice objects
+def compileElements(route, activityByName):
+    from ..model import Choice, compileRoute
+    elements = []
+    for element in route:
+        if isinstance(element, str):
+            element = activityByName[element]
+        elif isinstance(element, dict):
+            anyOrder = "anyOrder" in element
+            branches = [compileRoute(compileElements([branch] if isinstance(branch, str) else branch, activityByName),
+                                     True)
+                        for branch in element["anyOrder" if anyOrder else "oneOf"]]
+            element = Choice(branches, anyOrder, element.get("distance", 0))
+        elements.append(element)
+    return elements
+
+def syntheticCourse(noOfStations, teamTypes=("V", "S", "OB"), capacity=5, minDuration=10, maxDuration=15,
+                    distance=1.0, seed=None):
+    """Description of a linear course for benchmarks: a start, noOfStations - 2 posts and a finish
+    without duration, visited in the same order by every team type in teamTypes.
+    capacity, minDuration, maxDuration and distance (km between stations) are used for every post,
+    unless seed is given: then each post gets a capacity between capacity - 1 and capacity + 1,
+    and each leg a distance between half and 1.5 times distance"""
+    if noOfStations < 2:
+        raise ValueError("A course needs at least a start and a finish")
+    draw = random.Random(seed) if seed is not None else None
+    stations = [{"name": "Start", "capacity": capacity, "minDuration": minDuration, "maxDuration": maxDuration}]
+    for i in range(1, noOfStations - 1):
+        stations.append({"name": "Post %d" % i,
+                         "capacity": max(1, capacity + draw.randint(-1, 1)) if draw else capacity,
+                         "minDuration": minDuration, "maxDuration": maxDuration})
+    stations.append({"name": "Mål", "capacity": 99, "minDuration": None, "maxDuration": None})
+    route = []
+    for station in stations:
+        route += [station["name"], round(distance * draw.uniform(0.5, 1.5), 2) if draw else distance]
+    route.pop() # No distance after the finish
+    return {"stations": stations, "routes": {teamType: list(route) for teamType in teamTypes}}
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""Simulations spread over machines through a shared directory, without other services.
+
+A coordinator splits the runs of one or more scenarios into work units of consecutive runs and
+writes them to the directory. Workers on any machine that can see the directory (python -m
+flowsimulation --worker DIRECTORY) claim units by renaming them, simulate them and write the
+results back. Run i always gets the same seed (see runSeeds()), so the merged results do not
+depend on which worker ran which unit, and equal those of a single process.
+
+Layout of the directory:
+
+    job.json                          fingerprint of the job, no. of scenarios, runs and units
+    scenario-<k>.pickle               teams, activities and engine of scenario k
+    todo/unit-<k>-<first run>         units waiting for a worker: scenario no. and seeds (pickle)
+    claimed/<unit>.<worker>           units being simulated. The worker touches the file every few
+                                      seconds, and the coordinator moves units whose worker went
+                                      quiet back to todo. Unit names have no dots, worker ids (host
+                                      names) may have
+    done/<unit>.npz                   results of the unit (SimulationResults.save())
+    finished                          written when all results are in, to stop the workers
+
+Renames within a directory are atomic on local file systems and NFS, so a unit is claimed by one
+worker at a time. A coordinator started again with the same job resumes it: finished units are kept"""
+
+import hashlib
+import json
+import os
+import pickle
+import socket
+import threading
+import time
+from .model import scenarioTeamTypes
+from .results import SimulationResults, loadResults, scenarioFingerprint
+from .sampling import runSeeds
+from .runner import runSimulations
+
+class WorkQueue(object):
+    """The shared directory of a job, see the module docstring. Used by the coordinator (submit(),
+    wait(), results()) and by the workers (runWorker())"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        for name in ("todo", "claimed", "done"):
+            os.makedirs(self.path(name), exist_ok=True)
+
+    def path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def submit(self, scenarios, noOfRuns, seed=1, engine="simpy", sampling="plain", unitSize=100):
+        """Write the units of a job: noOfRuns runs of each scenario (Teams, Activities) in units of
+        unitSize runs. If the directory holds this job already, only the units that are neither
+        waiting, claimed nor done are written again. Raises ValueError if it holds another job"""
+        fingerprints = [scenarioFingerprint(Teams, Activities, seed, engine, sampling) for Teams, Activities in scenarios]
+        key = hashlib.sha256(json.dumps([fingerprints, noOfRuns, unitSize]).encode("utf-8")).hexdigest()
+        try:
+            with open(self.path("job.json"), encoding="utf-8") as f:
+                if json.load(f)["key"] != key:
+                    raise ValueError("%s holds another job" % self.directory)
+        except FileNotFoundError:
+            for k, (Teams, Activities) in enumerate(scenarios):
+                writeAtomically(self.path("scenario-%d.pickle" % k),
+                                pickle.dumps((Teams, Activities, engine)))
+            writeAtomically(self.path("job.json"), json.dumps(
+                {"key": key, "noOfScenarios": len(scenarios), "noOfRuns": noOfRuns, "unitSize": unitSize,
+                 "noOfTeams": [len(Teams) for Teams, Activities in scenarios],
+                 "noOfActivities": [len(Activities) for Teams, Activities in scenarios]}).encode("utf-8"))
+        self.noOfScenarios, self.noOfRuns = len(scenarios), noOfRuns
+        self.shapes = [(len(Teams), len(Activities), scenarioTeamTypes(Teams)) for Teams, Activities in scenarios]
+        self.units = [unitName(k, firstRun) for k in range(len(scenarios)) for firstRun in range(0, noOfRuns, unitSize)]
+        claimed = {name.partition(".")[0] for name in os.listdir(self.path("claimed"))}
+        present = set(os.listdir(self.path("todo"))) | claimed | self.doneUnits()
+        for k in range(len(scenarios)):
+            for firstRun in range(0, noOfRuns, unitSize):
+                if unitName(k, firstRun) not in present:
+                    seeds = runSeeds(seed, firstRun, min(unitSize, noOfRuns - firstRun), sampling)
+                    writeAtomically(self.path("todo", unitName(k, firstRun)), pickle.dumps((k, firstRun, seeds)))
+        return len(self.doneUnits() & set(self.units))
+
+    def doneUnits(self):
+        return {name[:-len(".npz")] for name in os.listdir(self.path("done")) if name.endswith(".npz")}
+
+    def reissueStale(self, timeout):
+        """Move units whose worker has not touched them for timeout seconds back to todo.
+        Returns the number of units moved"""
+        reissued = 0
+        for name in os.listdir(self.path("claimed")):
+            claimPath = self.path("claimed", name)
+            try:
+                if time.time() - os.stat(claimPath).st_mtime > timeout:
+                    os.rename(claimPath, self.path("todo", name.partition(".")[0]))
+                    reissued += 1
+            except FileNotFoundError: # Finished or moved meanwhile
+                pass
+        return reissued
+
+    def wait(self, timeout=30.0, poll=0.5, progress=None):
+        """Wait until all units of the job are done, re-issuing the units of workers that stopped
+        touching them for timeout seconds, which must be well above the heartbeat of the workers.
+        progress(done, total) is called when the count changes. Writes the finished file at the end"""
+        done = None
+        while True:
+            units = self.doneUnits() & set(self.units)
+            if len(units) != done:
+                done = len(units)
+                if progress is not None:
+                    progress(done, len(self.units))
+            if done == len(self.units):
+                break
+            self.reissueStale(timeout)
+            time.sleep(poll)
+        writeAtomically(self.path("finished"), b"")
+
+    def results(self, k):
+        """SimulationResults of scenario k, merged from its units in run order"""
+        noOfTeams, noOfActivities, types = self.shapes[k]
+        results = SimulationResults(self.noOfRuns, noOfTeams, noOfActivities, types)
+        for name in sorted(unit for unit in self.units if unit.startswith("unit-%03d-" % k)):
+            results.insert(int(name.rpartition("-")[2]), loadResults(self.path("done", name + ".npz")))
+        return results
+
+def unitName(k, firstRun):
+    return "unit-%03d-%09d" % (k, firstRun)
+
+# Write a file under a temporary name and rename it, so readers see all of it or nothing
+def writeAtomically(path, data):
+    temporaryPath = "%s.%s-%d.tmp" % (path, socket.gethostname(), os.getpid())
+    with open(temporaryPath, "wb") as f:
+        f.write(data)
+    os.replace(temporaryPath, path)
+
+def runDistributed(directory, scenarios, noOfRuns, seed=1, engine="simpy", sampling="plain", unitSize=100,
+                   timeout=30.0, progress=None):
+    """Coordinate a job in directory: submit the units, wait for the workers and return the
+    SimulationResults of each scenario (Teams, Activities), see WorkQueue. Start workers with
+    runWorker() or python -m flowsimulation --worker DIRECTORY, on this or other machines"""
+    queue = WorkQueue(directory)
+    queue.submit(scenarios, noOfRuns, seed, engine, sampling, unitSize)
+    queue.wait(timeout, progress=progress)
+    return [queue.results(k) for k in range(len(scenarios))]
+
+def runWorker(directory, workerId=None, heartbeat=5.0, poll=1.0, idleTimeout=None):
+    """Claim and simulate units of the job in directory until it is finished, or until no unit
+    could be claimed for idleTimeout seconds. The claimed unit is touched every heartbeat seconds
+    from a thread, so the coordinator can tell a slow worker from a dead one.
+    Returns the number of units simulated"""
+    queue = WorkQueue(directory)
+    workerId = workerId or "%s-%d" % (socket.gethostname(), os.getpid())
+    scenarios = {}
+    noOfUnits = 0
+    idleSince = time.time()
+    while not os.path.exists(queue.path("finished")):
+        claimPath = None
+        for name in sorted(os.listdir(queue.path("todo"))):
+            if name.endswith(".tmp"):
+                continue
+            claimPath = queue.path("claimed", "%s.%s" % (name, workerId))
+            try:
+                os.rename(queue.path("todo", name), claimPath)
+                # The rename keeps the time of the todo file, which may be older than the timeout
+                os.utime(claimPath)
+            except FileNotFoundError: # Claimed by another worker, or re-issued before the touch
+                claimPath = None
+                continue
+            if os.path.exists(queue.path("done", name + ".npz")): # Re-issued, but finished meanwhile
+                os.remove(claimPath)
+                claimPath = None
+                continue
+            break
+        if claimPath is None:
+            if idleTimeout is not None and time.time() - idleSince > idleTimeout:
+                break
+            time.sleep(poll)
+            continue
+        stop = threading.Event()
+        toucher = threading.Thread(target=touch, args=(claimPath, heartbeat, stop), daemon=True)
+        toucher.start()
+        try:
+            with open(claimPath, "rb") as f:
+                k, firstRun, seeds = pickle.load(f)
+            if k not in scenarios:
+                with open(queue.path("scenario-%d.pickle" % k), "rb") as f:
+                    scenarios[k] = pickle.load(f)
+            Teams, Activities, engine = scenarios[k]
+            results = runSimulations(Teams, Activities, seeds, engine)
+            temporaryPath = queue.path("done", "%s.%s.tmp.npz" % (name, workerId))
+            results.save(temporaryPath)
+            os.replace(temporaryPath, queue.path("done", name + ".npz"))
+        finally:
+            stop.set()
+            toucher.join()
+        try:
+            os.remove(claimPath)
+        except FileNotFoundError: # Re-issued meanwhile. The results are the same whoever finishes
+            pass
+        noOfUnits += 1
+        idleSince = time.time()
+    return noOfUnits
+
+# Touch path every interval seconds until stop is set
+def touch(path, interval, stop):
+    while not stop.wait(interval):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""Simulation engines: simpy, a plain event queue (heap), the heap engine with queue-aware routing
+(dynamic) and batched numpy arrays"""
+
+import heapq
+import itertools
+import collections
+import numpy
+from .model import tEnd, Activity, Choice, routeKey
+from .sampling import drawRandomInputs
+from .trace import enqueueEvent, startEvent, departEvent
+
+def start(env, teams, activities, trace=None):
+    for a in activities:
+        a.setup(env)
+    for t in teams:
+        t.setup(env)
+        t.trace = trace
+        waitTime = max(0, t.startTime - env.now)
+        yield env.timeout(waitTime)
+        env.process(t.start(env))
+
+# Run one replication with simpy. Steps through the events like env.run(until=tEnd), to count them
+def runSimpy(Teams, Activities, trace=None):
+    import simpy
+    env = simpy.Environment()
+    env.process(start(env, Teams, Activities, trace))
+    noOfEvents = 0
+    while env.peek() < tEnd:
+        env.step()
+        noOfEvents += 1
+    return noOfEvents
+
+def runHeap(Teams, Activities, trace=None, dynamic=False):
+    """Run one replication with a plain event queue instead of simpy.
+    Events are (time, sequence no., team no., step no.) in a heap. A team arrives at
+    step no. >= 0 and leaves step no. -1 - step. Stations are counted by Activity.index.
+    trace: TraceWriter to log the queue events to, or None.
+    dynamic: walk Team.dynamicRoute, choosing at each Choice when the team sets off for it,
+    see chooseBranch(). Returns the number of events processed.
+    Runs without trace and dynamic routing take a lean loop that keeps the state of the activities
+    in local lists and stores it in the activities at the end. The others go through
+    runHeapTraced(), which updates the activities event by event"""
+    if trace is not None or dynamic:
+        return runHeapTraced(Teams, Activities, trace, dynamic)
+    noOfActivities = len(Activities)
+    capacities = [a.capacity for a in Activities]
+    minDurations = [a.minDuration for a in Activities]
+    durationRanges = [a.maxDuration - a.minDuration if a.minDuration is not None else 0 for a in Activities]
+    busy = [0] * noOfActivities
+    queues = [collections.deque() for a in Activities]
+    maxQueues = [0] * noOfActivities
+    # Occupancy integrals up to tEnd, added when a visit starts and when the activity fills up and frees a slot
+    busyTimes = [0] * noOfActivities
+    queueTimes = [0] * noOfActivities
+    saturatedTimes = [0] * noOfActivities
+    saturatedSince = [0] * noOfActivities
+    peaks = [0] * noOfActivities
+    firstArrivals = [None] * noOfActivities
+    lastDepartures = [0] * noOfActivities
+    for a in Activities:
+        a.setup(None)
+    firstTeamStarts = [a.firstTeamStart for a in Activities]
+    lastTeamEnds = [a.lastTeamEnd for a in Activities]
+    distances = [] # Distance walked before each step of each team
+    stations = [] # Activity index of each step of each team, -1 for the distance after the last activity
+    paces = [] # Minutes per km of each team
+    events = []
+    sequenceNo = 0
+    for n, t in enumerate(Teams):
+        t.setup(None)
+        distances.append([distance for distance, a in t.route])
+        stations.append([a.index if a is not None else -1 for distance, a in t.route])
+        paces.append(60 / float(t.speed)) # Python floats, as numpy scalars are slow to compute with
+        if t.route:
+            events.append((t.startTime + t.route[0][0] * paces[n], sequenceNo, n, 0))
+            sequenceNo += 1
+        else:
+            t.endTime = t.startTime
+    heapq.heapify(events)
+    typeIndices = [t.typeIndex for t in Teams]
+    durationDraws = [t.durationDraws.tolist() for t in Teams]
+    teamWaits = [t.waits for t in Teams]
+    heappush, heappop = heapq.heappush, heapq.heappop
+
+    noOfEvents = 0
+    while events and events[0][0] < tEnd:
+        now, _, n, step = heappop(events)
+        noOfEvents += 1
+        if step >= 0: # Team arrives at activity
+            i = stations[n][step]
+            if i < 0: # Walked the last distance after the last activity
+                Teams[n].endTime = now
+                continue
+            if firstArrivals[i] is None:
+                firstArrivals[i] = now
+            if busy[i] == capacities[i]:
+                queue = queues[i]
+                queue.append((now, n, step))
+                if len(queue) > maxQueues[i]:
+                    maxQueues[i] = len(queue)
+                continue
+            busy[i] += 1 # Starts at once
+            if busy[i] > peaks[i]:
+                peaks[i] = busy[i]
+            if busy[i] == capacities[i]:
+                saturatedSince[i] = now
+            teamWaits[n][i] = 0
+            m, nextStep = n, None
+        else: # Team leaves activity
+            step = -1 - step
+            i = stations[n][step]
+            lastTeamEnds[i][typeIndices[n]] = now
+            lastDepartures[i] = now
+            step += 1
+            if step < len(stations[n]):
+                nextStep = step
+            else:
+                Teams[n].endTime = now
+                nextStep = None
+            queue = queues[i]
+            if queue: # The first team in the queue starts
+                arrivalTime, m, step = queue.popleft()
+                teamWaits[m][i] = now - arrivalTime
+                queueTimes[i] += now - arrivalTime
+            else:
+                if busy[i] == capacities[i]:
+                    saturatedTimes[i] += now - saturatedSince[i]
+                busy[i] -= 1
+                if nextStep is not None:
+                    heappush(events, (now + distances[n][nextStep] * paces[n], sequenceNo, n, nextStep))
+                    sequenceNo += 1
+                continue
+        # Team m starts its visit of activity i at step no. step
+        if firstTeamStarts[i][typeIndices[m]] == 0:
+            firstTeamStarts[i][typeIndices[m]] = now
+        if minDurations[i] is None:
+            heappush(events, (now, sequenceNo, m, -1 - step))
+        else:
+            end = now + (minDurations[i] + durationDraws[m][i] * durationRanges[i])
+            busyTimes[i] += (end if end < tEnd else tEnd) - now
+            heappush(events, (end, sequenceNo, m, -1 - step))
+        sequenceNo += 1
+        if nextStep is None:
+            continue
+        # Team n walks on to its next step after m starts, in the order of runHeapTraced()
+        heappush(events, (now + distances[n][nextStep] * paces[n], sequenceNo, n, nextStep))
+        sequenceNo += 1
+
+    for i, a in enumerate(Activities):
+        for arrivalTime, m, step in queues[i]: # Teams still waiting at tEnd
+            queueTimes[i] += tEnd - arrivalTime
+        if busy[i] == capacities[i]:
+            saturatedTimes[i] += tEnd - saturatedSince[i]
+        # Nothing is left for persistStats() to add up to tEnd
+        a.lastChange, a.queued, a.inService = tEnd, len(queues[i]), busy[i]
+        a.maxQueue, a.busyTime, a.queueTime = maxQueues[i], busyTimes[i], queueTimes[i]
+        a.saturatedTime, a.peakBusy = saturatedTimes[i], peaks[i]
+        a.firstArrival, a.lastDeparture = firstArrivals[i], lastDepartures[i]
+    return noOfEvents
+
+def runHeapTraced(Teams, Activities, trace=None, dynamic=False):
+    """runHeap() event by event, with a trace or dynamic routing"""
+    busy = [0] * len(Activities)
+    queues = [collections.deque() for a in Activities]
+    heading = [0] * len(Activities) # Teams walking to each activity, with dynamic
+    routes = []
+    paces = [] # Minutes per km for each team
+    events = []
+    sequence = itertools.count()
+    for a in Activities:
+        a.setup(None)
+    for n, t in enumerate(Teams):
+        t.setup(None)
+        route = [(distance, a, a.index if isinstance(a, Activity) else -1)
+                 for distance, a in (t.dynamicRoute if dynamic else t.route)]
+        routes.append(route)
+        paces.append(60 / t.speed)
+        if route:
+            if dynamic:
+                setOff(route, 0, paces[n], Activities, busy, queues, heading)
+            heapq.heappush(events, (t.startTime + route[0][0] * paces[n], next(sequence), n, 0))
+        else:
+            t.endTime = t.startTime
+
+    noOfEvents = 0
+    while events and events[0][0] < tEnd:
+        now, _, n, step = heapq.heappop(events)
+        noOfEvents += 1
+        team = Teams[n]
+        route = routes[n]
+        if step >= 0: # Team arrives at activity
+            distance, a, i = route[step]
+            if a is None: # Walked the last distance after the last activity
+                team.endTime = now
+                continue
+            if dynamic:
+                heading[i] -= 1
+            a.updateOccupancy(now, 1, 0)
+            if trace is not None:
+                trace.enqueue(now, i, team.index)
+            if busy[i] < a.capacity:
+                busy[i] += 1
+                serveTeam(a, team, now, 0, events, next(sequence), n, step, trace)
+            else:
+                queues[i].append((now, n, step))
+                a.maxQueue = max(len(queues[i]), a.maxQueue)
+        else: # Team leaves activity
+            step = -1 - step
+            distance, a, i = route[step]
+            a.lastTeamEnd[team.typeIndex] = now
+            a.updateOccupancy(now, 0, -1)
+            if trace is not None:
+                trace.depart(now, i, team.index)
+            if queues[i]:
+                arrivalTime, m, queuedStep = queues[i].popleft()
+                serveTeam(a, Teams[m], now, now - arrivalTime, events, next(sequence), m, queuedStep, trace)
+            else:
+                busy[i] -= 1
+            step += 1
+            if step < len(route):
+                if dynamic:
+                    setOff(route, step, paces[n], Activities, busy, queues, heading)
+                heapq.heappush(events, (now + route[step][0] * paces[n], next(sequence), n, step))
+            else:
+                team.endTime = now
+    return noOfEvents
+
+def runDynamic(Teams, Activities, trace=None):
+    """Run one replication with the heap engine and queue-aware routing, see chooseBranch()"""
+    return runHeap(Teams, Activities, trace, dynamic=True)
+
+# Dynamic routing in the heap engine: a team sets off for step no. step of its route. A Choice at
+# that step is replaced by the steps of the branch it takes, and the team is counted as heading
+# for the activity it walks to
+def setOff(route, step, pace, Activities, busy, queues, heading):
+    while isinstance(route[step][1], Choice):
+        distance, choice, i = route[step]
+        k = chooseBranch(choice, distance, pace, Activities, busy, queues, heading)
+        route[step:step + 1] = [(distance, a, a.index if isinstance(a, Activity) else -1)
+                                for distance, a in choice.expand(k, distance)]
+    if route[step][2] >= 0:
+        heading[route[step][2]] += 1
+
+def chooseBranch(choice, distance, pace, Activities, busy, queues, heading):
+    """Branch of a Choice a team takes when it sets off for it: the one whose first activity it is
+    expected to start first. That is the walking time plus the expected wait, counting the teams in
+    service, queueing and heading for the activity (an O(1) lookup per activity): each team beyond
+    the capacity waits for a mean visit divided by the capacity. Ties go to the first branch"""
+    best, bestTime = 0, numpy.inf
+    for k, branch in enumerate(choice.branches):
+        first, a = branch[0]
+        startTime = (distance + first) * pace
+        if isinstance(a, Activity) and a.minDuration is not None:
+            i = a.index
+            excess = busy[i] + len(queues[i]) + heading[i] + 1 - a.capacity
+            if excess > 0:
+                startTime += excess * (a.minDuration + a.maxDuration) / 2 / a.capacity
+        if startTime < bestTime:
+            best, bestTime = k, startTime
+    return best
+
+# Start activity for a team in the heap engine and schedule its departure
+def serveTeam(a, team, now, waitTime, events, sequenceNo, n, step, trace=None):
+    team.waits[a.index] = waitTime
+    a.updateOccupancy(now, -1, 1)
+    if trace is not None:
+        trace.start(now, a.index, team.index)
+    if a.firstTeamStart[team.typeIndex] == 0:
+        a.firstTeamStart[team.typeIndex] = now
+    if a.minDuration is None:
+        heapq.heappush(events, (now, sequenceNo, n, -1 - step))
+    else:
+        heapq.heappush(events, (now + a.duration(team), sequenceNo, n, -1 - step))
+
+def stationOrder(Teams, Activities):
+    """Order the activities so that each comes after every activity before it on any route.
+    Ties keep the order of Activities. Raises ValueError if two routes disagree"""
+    following = [set() for a in Activities]
+    for stations in {tuple(a.index for distance, a in t.route if a is not None) for t in Teams}:
+        for i, j in zip(stations, stations[1:]):
+            following[i].add(j)
+    noOfPreceding = [0] * len(Activities)
+    for i in range(len(Activities)):
+        for j in following[i]:
+            noOfPreceding[j] += 1
+    ready = [i for i in range(len(Activities)) if noOfPreceding[i] == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        i = heapq.heappop(ready)
+        order.append(i)
+        for j in following[i]:
+            noOfPreceding[j] -= 1
+            if noOfPreceding[j] == 0:
+                heapq.heappush(ready, j)
+    if len(order) < len(Activities):
+        raise ValueError("Routes visit activities in conflicting orders")
+    return order
+
+def fifoStarts(arrivals, durations, capacity):
+    """Service start times at a FIFO station with capacity servers, for a (runs x teams) array of arrivals.
+    Returns starts in the order of arrivals, and sorted arrivals and starts for each run"""
+    order = numpy.argsort(arrivals, axis=1, kind="stable")
+    sortedArrivals = numpy.take_along_axis(arrivals, order, 1)
+    sortedStarts = sortedArrivals.copy()
+    noOfRuns, noOfTeams = arrivals.shape
+    if capacity < noOfTeams:
+        sortedDurations = numpy.take_along_axis(durations, order, 1)
+        rows = numpy.arange(noOfRuns)
+        free = numpy.full((noOfRuns, capacity), -numpy.inf) # Time each server becomes free
+        for i in range(noOfTeams):
+            server = free.argmin(axis=1)
+            start = numpy.maximum(sortedArrivals[:, i], free[rows, server])
+            sortedStarts[:, i] = start
+            free[rows, server] = start + sortedDurations[:, i]
+    starts = numpy.empty_like(sortedStarts)
+    numpy.put_along_axis(starts, order, sortedStarts, 1)
+    return starts, sortedArrivals, sortedStarts
+
+# Longest queue seen by an arriving team in each run, counting the team itself if it has to wait
+def maxQueueLengths(sortedArrivals, sortedStarts):
+    noOfRuns, noOfTeams = sortedArrivals.shape
+    # Offset each run so a single searchsorted counts starts per run
+    offset = (numpy.arange(noOfRuns) * (max(sortedArrivals.max(), sortedStarts.max()) + 1))[:, None]
+    started = numpy.searchsorted((sortedStarts + offset).ravel(), (sortedArrivals + offset).ravel(),
+                                 "right").reshape(noOfRuns, noOfTeams)
+    started -= (numpy.arange(noOfRuns) * noOfTeams)[:, None]
+    queue = numpy.arange(1, noOfTeams + 1) - numpy.minimum(started, numpy.arange(1, noOfTeams + 1))
+    queue[sortedArrivals >= tEnd] = 0
+    return queue.max(axis=1)
+
+def occupancyStats(results, i, capacity, arrivals, starts, ends):
+    """Occupancy integrals of station i for (runs x teams) arrays of arrivals, starts and ends,
+    as Activity.updateOccupancy() computes them event by event: busy, queue and saturated time up
+    to tEnd, peak no. of teams in service and the time from the first arrival to the last departure"""
+    arrived = arrivals < tEnd
+    results.busyTime[:, i] = (numpy.minimum(ends, tEnd) - numpy.minimum(starts, tEnd)).sum(axis=1)
+    results.queueTime[:, i] = numpy.where(arrived, numpy.minimum(starts, tEnd) - arrivals, 0).sum(axis=1)
+    # Teams in service after each start (+1) and end (-1) in time order. At equal times an end hands its
+    # slot over before a start, except the end of a visit without duration, which follows its start
+    times = numpy.concatenate([ends, starts], axis=1)
+    steps = numpy.concatenate([-numpy.ones_like(ends), numpy.ones_like(starts)], axis=1)
+    ties = numpy.concatenate([numpy.where(ends > starts, 0, 2), numpy.ones_like(starts)], axis=1)
+    order = numpy.lexsort((ties, times), axis=-1)
+    times = numpy.minimum(numpy.take_along_axis(times, order, 1), tEnd)
+    inService = numpy.cumsum(numpy.take_along_axis(steps, order, 1), axis=1)
+    results.peakBusy[:, i] = numpy.where(times < tEnd, inService, 0).max(axis=1)
+    intervals = numpy.diff(times, axis=1, append=tEnd)
+    results.saturatedTime[:, i] = numpy.where(inService == capacity, intervals, 0).sum(axis=1)
+    firstArrival = numpy.where(arrived, arrivals, numpy.inf).min(axis=1)
+    stillThere = (arrived & (ends >= tEnd)).any(axis=1)
+    lastDeparture = numpy.where(ends < tEnd, ends, -numpy.inf).max(axis=1)
+    results.openTime[:, i] = numpy.where(arrived.any(axis=1),
+                                         numpy.where(stillThere, tEnd, lastDeparture) - firstArrival, 0)
+
+class Checkpoint(object):
+    """Random draws, arrivals and results of the last runNumpy() call.
+    A later call with the same teams and seeds resumes at the first station (in station order)
+    whose capacity or duration changed, reusing the draws and the stations before it"""
+
+    def __init__(self):
+        self.modelKey = None
+        self.stationKeys = []
+        self.departures = [] # Departures of all teams before each station, in station order
+
+    # Position in station order to resume at: 0 for a different model, len(order) if nothing changed
+    def resumePosition(self, modelKey, stationKeys):
+        if modelKey != self.modelKey:
+            return 0
+        for position, (key, oldKey) in enumerate(zip(stationKeys, self.stationKeys)):
+            if key != oldKey:
+                return position
+        return len(stationKeys)
+
+def runNumpy(Teams, Activities, seeds, results, checkpoint=None, trace=None):
+    """Run all replications at once with arrays of shape (runs x teams), one station at a time.
+    Stations are visited in stationOrder(), so all arrivals at a station are known when it is
+    resolved. The speeds and durations of all runs are drawn up front by drawRandomInputs().
+    Teams with notBefore set leave their first activity at that time at the earliest, as a team
+    that has not checked out of it yet (see forecast).
+    checkpoint: Checkpoint of an earlier call, to skip the stations upstream of the first change.
+    trace: TraceWriter to log the queue events of the runs to, as runs trace.noOfRuns onwards.
+    Stations skipped by the checkpoint are not traced.
+    Returns the number of events processed, counting an arrival and a departure per visit before tEnd
+    as the heap engine does"""
+    Teams = sorted(Teams, key=lambda t: t.index) # Draws follow team index, not start order
+    noOfRuns, noOfTeams = len(seeds), len(Teams)
+    order = stationOrder(Teams, Activities)
+    modelKey = (list(seeds), tEnd, order,
+                [(t.teamType, t.startTime, t.speedDistribution(), t.notBefore,
+                  routeKey(t.route)) for t in Teams])
+    stationKeys = [(Activities[i].capacity, Activities[i].minDuration, Activities[i].maxDuration) for i in order]
+    resumeAt = checkpoint.resumePosition(modelKey, stationKeys) if checkpoint is not None else 0
+    if resumeAt > 0:
+        normals, uniforms = checkpoint.normals, checkpoint.uniforms
+        results.insert(0, checkpoint.results)
+    else:
+        normals, uniforms = drawRandomInputs(seeds, noOfTeams, len(Activities))
+    speedDistributions = numpy.array([t.speedDistribution() for t in Teams]).reshape(-1, 2)
+    speeds = speedDistributions[:, 0] + speedDistributions[:, 1] * normals
+    paces = 60 / speeds # Minutes per km
+    typeIndices = numpy.array([t.typeIndex for t in Teams], dtype=int)
+    if resumeAt > 0:
+        departures = checkpoint.departures[resumeAt].copy()
+        checkpointDepartures = checkpoint.departures[:resumeAt + 1]
+    else:
+        departures = numpy.tile(numpy.array([t.startTime for t in Teams], dtype=float), (noOfRuns, 1))
+        checkpointDepartures = [departures.copy()]
+
+    visits = [[] for a in Activities] # (team no., distance) for each station
+    for n, t in enumerate(Teams):
+        for distance, a in t.route:
+            if a is not None:
+                visits[a.index].append((n, distance))
+    # Teams with notBefore cannot leave their first station before it
+    firstStations = numpy.array([t.route[0][1].index if t.route and t.route[0][1] is not None else -1 for t in Teams])
+    notBefore = numpy.array([t.notBefore if t.notBefore is not None else -numpy.inf for t in Teams])
+
+    noOfEvents = 0
+    for position, i in enumerate(order):
+        a = Activities[i]
+        if position < resumeAt or not visits[i]:
+            if position >= resumeAt:
+                checkpointDepartures.append(departures.copy())
+            continue
+        teamNos = numpy.array([n for n, distance in visits[i]])
+        distances = numpy.array([distance for n, distance in visits[i]])
+        arrivals = departures[:, teamNos] + distances * paces[:, teamNos]
+        if a.minDuration is None:
+            durations = numpy.zeros_like(arrivals)
+        else:
+            durations = a.minDuration + uniforms[:, teamNos, i] * (a.maxDuration - a.minDuration)
+        starts, sortedArrivals, sortedStarts = fifoStarts(arrivals, durations, a.capacity)
+        ends = numpy.where(firstStations[teamNos] == i, numpy.maximum(starts + durations, notBefore[teamNos]),
+                           starts + durations)
+        departures[:, teamNos] = ends
+
+        started = starts < tEnd
+        ended = ends < tEnd
+        noOfEvents += int(numpy.count_nonzero(arrivals < tEnd) + numpy.count_nonzero(ended))
+        if trace is not None: # Teams are in index order here
+            runNos = trace.noOfRuns + numpy.arange(noOfRuns)[:, None]
+            for event, times, isTraced in ((enqueueEvent, arrivals, arrivals < tEnd), (startEvent, starts, started),
+                                           (departEvent, ends, ended)):
+                runNoGrid, teamGrid = numpy.broadcast_arrays(runNos, teamNos)
+                trace.records(runNoGrid[isTraced], times[isTraced], i, teamGrid[isTraced], event)
+        results.waits[:, teamNos, i] = numpy.where(started, starts - arrivals, numpy.nan)
+        for k in numpy.unique(typeIndices[teamNos]): # The other team types keep 0
+            isType = typeIndices[teamNos] == k
+            first = numpy.where(started & isType, starts, numpy.inf).min(axis=1)
+            results.firstTeamStart[:, i, k] = numpy.where(numpy.isfinite(first), first, 0)
+            results.lastTeamEnd[:, i, k] = numpy.where(ended & isType, ends, 0).max(axis=1)
+        results.maxQueue[:, i] = maxQueueLengths(sortedArrivals, sortedStarts)
+        occupancyStats(results, i, a.capacity, arrivals, starts, ends)
+        checkpointDepartures.append(departures.copy())
+
+    if checkpoint is not None:
+        checkpoint.modelKey, checkpoint.stationKeys = modelKey, stationKeys
+        checkpoint.normals, checkpoint.uniforms = normals, uniforms
+        checkpoint.departures = checkpointDepartures
+        checkpoint.results = results.copy()
+    for n, t in enumerate(Teams):
+        if t.route and t.route[-1][1] is None: # Walk the last distance after the last activity
+            departures[:, n] += t.route[-1][0] * paces[:, n]
+    results.endTime[:] = numpy.where(departures < tEnd, departures, 0)
+    return noOfEvents
+
+# Simulation engines. Each runs a single replication on teams and activities and returns the
+# number of events processed. dynamic is the heap engine with queue-aware routing at choices
+engines = {"simpy": runSimpy, "heap": runHeap, "dynamic": runDynamic}
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Live forecasts on race night. Check-ins (team, post, time) give the position of each team and
+a better estimate of its speed. A forecast simulates only the rest of the race from there, with
+the numpy engine, and predicts when the posts close and the teams finish"""
+
+import copy
+import csv
+import math
+import numpy
+from .model import groupStartTimes, tEnd, scenarioTeamTypes
+from .results import SimulationResults
+from .engines import runNumpy
+from .sampling import runSeeds
+
+# Check-in events: a team arrives at or leaves a post
+checkInEvents = ["arrive", "leave"]
+
+def parseTime(text):
+    """Minutes since midnight from "HH:MM" or a number of minutes. Clock times before the first
+    group start are taken to be after midnight, as the race runs through the night"""
+    text = text.strip()
+    if ":" not in text:
+        return float(text)
+    hours, minutes = text.split(":")
+    time = int(hours) * 60 + float(minutes)
+    if time < min(groupStartTimes.values()):
+        time += 24 * 60
+    return time
+
+def readCheckIns(path):
+    """Check-ins from a CSV file with lines team,post,time[,event], where team is the team name
+    (e.g. Hold 3 (V)) or index, time is HH:MM or minutes and event is leave (default) or arrive.
+    Empty lines, lines starting with # and a header line starting with team are skipped"""
+    checkIns = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for lineNo, row in enumerate(csv.reader(f), 1):
+            if not row or row[0].startswith("#") or (lineNo == 1 and row[0].strip().lower() == "team"):
+                continue
+            if len(row) not in (3, 4):
+                raise ValueError("%s:%d: expected team,post,time[,event]" % (path, lineNo))
+            event = row[3].strip() if len(row) == 4 else "leave"
+            if event not in checkInEvents:
+                raise ValueError("%s:%d: unknown event %r" % (path, lineNo, event))
+            try:
+                time = parseTime(row[2])
+            except ValueError:
+                raise ValueError("%s:%d: bad time %r" % (path, lineNo, row[2])) from None
+            checkIns.append((row[0].strip(), row[1].strip(), time, event))
+    return checkIns
+
+class Forecaster(object):
+    """Race state from check-ins. observe() adds check-ins, forecast() simulates the rest of the race.
+    The state of a team is its latest check-in along its route, and its speed is estimated from the
+    time it took to get there (see speedEstimate())"""
+
+    def __init__(self, Teams, Activities):
+        self.Teams = sorted(Teams, key=lambda t: t.index)
+        self.Activities = Activities
+        self.teamByName = {t.name: t for t in self.Teams}
+        self.checkIns = {} # Team index -> (step no. in its route, time, event) of its latest check-in
+        self.lastLeave = {} # Activity index -> latest time a team was seen leaving it
+        self.now = None # Time of the latest check-in
+
+    def team(self, reference):
+        if reference in self.teamByName:
+            return self.teamByName[reference]
+        if reference.isdigit() and int(reference) < len(self.Teams):
+            return self.Teams[int(reference)]
+        raise ValueError("Unknown team: %s" % reference)
+
+    def observe(self, checkIns):
+        """Add (team, post, time, event) check-ins, see readCheckIns(). Check-ins behind the latest
+        one of a team along its route are ignored, so they may arrive in any order"""
+        for reference, post, time, event in checkIns:
+            team = self.team(reference)
+            steps = [step for step, (distance, a) in enumerate(team.route) if a is not None and a.name == post]
+            if not steps:
+                raise ValueError("%s does not visit %s" % (team.name, post))
+            state = (steps[0], event == "leave", time)
+            latest = self.checkIns.get(team.index)
+            if latest is None or state > (latest[0], latest[2] == "leave", latest[1]):
+                self.checkIns[team.index] = (steps[0], time, event)
+            if event == "leave":
+                i = team.route[steps[0]][1].index
+                self.lastLeave[i] = max(self.lastLeave.get(i, time), time)
+            self.now = time if self.now is None else max(self.now, time)
+
+    def speedEstimate(self, team):
+        """(mean, stdev) of the speed of a team given its latest check-in: the speed of its type,
+        updated with the speed it walked so far (normal prior and measurement). The walking time is the
+        time since its start minus the mean durations of the activities on the way, and the measurement
+        error comes from the spread of those durations and from the waits, which are not known: each
+        activity on the way adds a wait of about a quarter of a visit, with twice that standard deviation"""
+        mean, stdev = team.speedDistribution()
+        if team.index not in self.checkIns or stdev == 0: # Nothing to learn about a known speed
+            return mean, stdev
+        step, time, event = self.checkIns[team.index]
+        distance = sum(d for d, a in team.route[:step + 1])
+        walkingTime = time - team.startTime
+        durationVariance = 0.0
+        for d, a in team.route[:step + 1 if event == "leave" else step]:
+            if a is not None and a.minDuration is not None:
+                serviceMean = (a.minDuration + a.maxDuration) / 2
+                walkingTime -= serviceMean * 1.25
+                durationVariance += (a.maxDuration - a.minDuration) ** 2 / 12 + (serviceMean / 2) ** 2
+        if distance <= 0 or walkingTime <= 0:
+            return mean, stdev
+        observed = distance / walkingTime * 60
+        # Error of the observed speed, with at least a minute of slack in the check-in times
+        error = observed * math.sqrt(durationVariance + 1) / walkingTime
+        precision = 1 / stdev ** 2 + 1 / error ** 2
+        return (mean / stdev ** 2 + observed / error ** 2) / precision, 1 / math.sqrt(precision)
+
+    def remainingTeams(self, now):
+        """Copies of the teams that start at their latest check-in and walk the rest of their route.
+        A team that arrived at a post starts there without walking, and a team that left a post starts
+        at the time it left. Teams with a check-in cannot leave their next post before now, or it would
+        have been seen. Teams without check-ins run from their start, and cannot leave their first post
+        before now either"""
+        teams = []
+        for t in self.Teams:
+            remaining = copy.copy(t)
+            remaining.waits = {}
+            if t.index in self.checkIns:
+                step, time, event = self.checkIns[t.index]
+                remaining.speedEstimate = self.speedEstimate(t)
+                if event == "arrive":
+                    remaining.route = [(0, t.route[step][1])] + t.route[step + 1:]
+                else:
+                    remaining.route = t.route[step + 1:]
+                remaining.dynamicRoute = remaining.route # The forecast follows the route of the other engines
+                remaining.startTime = time
+                if remaining.route and remaining.route[0][1] is not None:
+                    remaining.notBefore = max(now, time)
+            elif now > t.startTime and t.route and t.route[0][1] is not None:
+                remaining.notBefore = now
+            teams.append(remaining)
+        return teams
+
+    def forecast(self, noOfRuns=1000, seed=1, now=None):
+        """Simulate the rest of the race noOfRuns times from the state at time now (default: the latest
+        check-in). Returns a dict with now, results (SimulationResults of the remaining race), posts
+        and teams. posts has a dict per activity with remaining (mean no. of visits still to come), closed
+        (no visits to come), lastLeave (latest check-out seen) and the 50th and 95th percentile of the
+        closing time. teams has a dict per team with the 50th and 95th percentile of its finish time,
+        counting teams that do not finish as finishing at tEnd"""
+        now = self.now if now is None else now
+        teams = self.remainingTeams(now if now is not None else 0)
+        results = SimulationResults(noOfRuns, len(teams), len(self.Activities), scenarioTeamTypes(teams))
+        runNumpy(teams, self.Activities, runSeeds(seed, 0, noOfRuns), results)
+        posts = []
+        for a in self.Activities:
+            closes = results.lastTeamEnd[:, a.index, :].max(axis=1)
+            remaining = numpy.count_nonzero(~numpy.isnan(results.waits[:, :, a.index])) / noOfRuns
+            closed = not numpy.any(closes)
+            p50, p95 = numpy.percentile(closes[closes > 0], [50, 95]) if not closed else (None, None)
+            posts.append({"activity": a, "remaining": remaining, "closed": closed,
+                          "lastLeave": self.lastLeave.get(a.index), "close50": p50, "close95": p95})
+        finish = numpy.where(results.endTime == 0, tEnd, results.endTime)
+        teamForecasts = [{"team": t, "finish50": numpy.percentile(finish[:, t.index], 50),
+                          "finish95": numpy.percentile(finish[:, t.index], 95),
+                          "checkIn": self.checkIns.get(t.index)} for t in self.Teams]
+        return {"now": now, "results": results, "posts": posts, "teams": teamForecasts}
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""Course model: race parameters, activities and teams"""
+
+import numbers
+from .courses import loadCourse
+
+# 8:00, 9:00, 10:00
+groupStartTimes = {"V": 8*60, "S": 9*60, "OB": 10*60}
+
+# No. of teams to start simultaneously
+tStartSimul = {"V":3, "S":4, "OB":4}
+
+tStartInterval = 15        # Time between starting teams
+
+tEnd = 30 * 60              # 06:00
+
+tActivityBuffer = 5         # Extra buffer to add to activities
+# Speeds in km/h (2021 measurements)
+#meanSpeed = {"V": 3.3, "S":4, "OB": 4.3}
+#stdevSpeed = {"V": 0.4, "S":0.4, "OB":0.5}
+
+# Speeds in km/h (2022 measurements)
+meanSpeed = {"V": 3.0, "S":3.5, "OB": 4.0} 
+
+stdevSpeed = {"V": 0.5, "S":0.5, "OB":0.5}
+
+
+# Built-in team types. A course file may declare more, for the scenarios on that course only
+# (see scenarioParameters()). The team types of a scenario are indexed by Team.typeIndex
+teamTypes = ["V", "S", "OB"]
+
+# Expected
+# V: 20:30 - 03:10
+# S: 23:15 - 03:35
+# OB: 00:00 - 03:30
+class Activity(object):
+    __slots__ = ("capacity", "minDuration", "maxDuration", "name", "index", "env", "slots", "firstTeamStart",
+                 "lastTeamEnd", "maxQueue", "queued", "inService", "lastChange", "busyTime", "queueTime",
+                 "saturatedTime", "peakBusy", "firstArrival", "lastDeparture", "noOfTeamTypes")
+
+    def __init__(self, capacity, minDuration, maxDuration, name):
+        self.capacity = capacity
+        self.minDuration = minDuration
+        self.maxDuration = maxDuration
+        self.name = name
+        self.index = 0 # Position in the list of activities. Set by setupModel()
+        self.noOfTeamTypes = len(teamTypes) # Team types of the scenario. Set by setupModel()
+        self.firstTeamStart = [] # First start and last departure per team type index, 0 if none. Set by setup()
+        self.lastTeamEnd = []
+
+    # Invoked for each run. env is None when the run uses the heap engine
+    def setup(self, env):
+        self.env = env
+        if env is not None:
+            import simpy # Only the simpy engine needs it, so it is not imported with the package
+            self.slots = simpy.Resource(env, self.capacity)
+        if len(self.firstTeamStart) == self.noOfTeamTypes: # Reuse the lists of the last run
+            for k in range(self.noOfTeamTypes):
+                self.firstTeamStart[k] = self.lastTeamEnd[k] = 0
+        else:
+            self.firstTeamStart = [0] * self.noOfTeamTypes
+            self.lastTeamEnd = [0] * self.noOfTeamTypes
+        self.maxQueue = 0 # High watermark for queue
+        # Occupancy integrals, updated at each arrival, start and departure by updateOccupancy()
+        self.queued = 0
+        self.inService = 0
+        self.lastChange = 0 # Time of the last change of queued or inService
+        self.busyTime = 0 # Integral of the teams in service over time
+        self.queueTime = 0 # Integral of the queue length over time
+        self.saturatedTime = 0 # Time with all slots in use
+        self.peakBusy = 0
+        self.firstArrival = None
+        self.lastDeparture = 0
+
+    # Pickled for worker processes without the simpy state of the last run, which cannot be unpickled
+    def __getstate__(self):
+        return None, slotState(self, ("env", "slots"))
+
+    # Let team start activity
+    def acceptTeam(self, team):
+        tIn = self.env.now
+
+        if self.firstTeamStart[team.typeIndex] == 0:
+            self.firstTeamStart[team.typeIndex] = tIn
+
+        if self.minDuration is None:
+            yield self.env.timeout(0)
+        else:
+            yield self.env.timeout(self.duration(team))
+
+        tOut = self.env.now
+        self.lastTeamEnd[team.typeIndex] = tOut
+
+    # Duration of the visit of a team, from its duration draw for this activity
+    def duration(self, team):
+        return self.minDuration + team.durationDraws[self.index] * (self.maxDuration - self.minDuration)
+
+    # Update high watermark if necessary
+    def updateMaxQueue(self):
+        self.maxQueue = max(len(self.slots.queue), self.maxQueue)
+
+    # Add the time since the last change to the occupancy integrals, then change the no. of teams
+    # queueing and in service: (1, 0) on arrival, (-1, 1) when a team starts, (0, -1) when it leaves
+    def updateOccupancy(self, now, queueChange, serviceChange):
+        elapsed = now - self.lastChange
+        self.busyTime += elapsed * self.inService
+        self.queueTime += elapsed * self.queued
+        if self.inService == self.capacity:
+            self.saturatedTime += elapsed
+        self.lastChange = now
+        self.queued += queueChange
+        self.inService += serviceChange
+        if self.inService > self.peakBusy:
+            self.peakBusy = self.inService
+        if self.firstArrival is None and queueChange > 0:
+            self.firstArrival = now
+        if serviceChange < 0:
+            self.lastDeparture = now
+
+    # Store statistics of the run in the result arrays
+    def persistStats(self, results, run):
+        results.firstTeamStart[run, self.index] = self.firstTeamStart
+        results.lastTeamEnd[run, self.index] = self.lastTeamEnd
+        results.maxQueue[run, self.index] = self.maxQueue
+        self.updateOccupancy(tEnd, 0, 0) # Teams still present at the end count until tEnd
+        results.busyTime[run, self.index] = self.busyTime
+        results.queueTime[run, self.index] = self.queueTime
+        results.saturatedTime[run, self.index] = self.saturatedTime
+        results.peakBusy[run, self.index] = self.peakBusy
+        if self.firstArrival is not None:
+            closeTime = tEnd if self.queued or self.inService else self.lastDeparture
+            results.openTime[run, self.index] = closeTime - self.firstArrival
+
+class Choice(object):
+    """Part of a course where a team chooses its way when it gets there: branches are routes of
+    (distance, activity) steps, see compileRoute(), each starting and ending at an activity.
+    With anyOrder the team visits every branch, in an order of its choosing, walking distance
+    between them. Otherwise it visits one branch. The dynamic engine chooses by the queues at
+    the time, the other engines take the branches in the order given (fixedSteps())"""
+    __slots__ = ("branches", "anyOrder", "distance", "remaining")
+
+    def __init__(self, branches, anyOrder=False, distance=0):
+        self.branches = branches
+        self.anyOrder = anyOrder
+        self.distance = distance
+        self.remaining = {} # Branch no. -> Choice between the other branches, with anyOrder
+
+    # Steps of a team that walks distance and then takes branch k. With anyOrder, the choice
+    # between the other branches follows
+    def expand(self, k, distance):
+        first, a = self.branches[k][0]
+        steps = [(distance + first, a)] + self.branches[k][1:]
+        if self.anyOrder and len(self.branches) > 1:
+            if k not in self.remaining:
+                self.remaining[k] = Choice(self.branches[:k] + self.branches[k + 1:], True, self.distance)
+            steps.append((self.distance, self.remaining[k]))
+        return steps
+
+    # Steps of a team that walks distance and takes the branches in the order given
+    def fixedSteps(self, distance):
+        steps = []
+        for distance, a in self.expand(0, distance):
+            if isinstance(a, Choice):
+                steps += a.fixedSteps(distance)
+            else:
+                steps.append((distance, a))
+        return steps
+
+    # Description for fingerprints, with activities by index
+    def key(self):
+        return {"anyOrder": self.anyOrder, "distance": self.distance, "branches": [routeKey(b) for b in self.branches]}
+
+class Team:
+    __slots__ = ("name", "teamType", "typeIndex", "teamTypes", "typeSpeed", "course", "startTime", "route",
+                 "dynamicRoute", "index", "speedEstimate", "notBefore", "env", "speed", "speedDraw", "durationDraws",
+                 "waits", "endTime", "trace")
+
+    # types: team types of the scenario (default: the built-in ones), typeSpeed: (mean, stdev) of the
+    # speed of the team type (default: meanSpeed and stdevSpeed)
+    def __init__(self, name, teamType, course, startTime, types=None, typeSpeed=None):
+        self.name = name
+        self.teamType = teamType
+        self.teamTypes = types if types is not None else teamTypes
+        self.typeIndex = self.teamTypes.index(teamType) # Index of the team type in the result arrays
+        self.typeSpeed = typeSpeed if typeSpeed is not None else (meanSpeed[teamType], stdevSpeed[teamType])
+        self.course = course
+        self.startTime = startTime
+        self.route = compileRoute(course) # (distance, activity) steps, walked by all engines
+        self.dynamicRoute = compileRoute(course, True) # Steps with the choices of the course, see Choice
+        self.index = 0 # Position in the list of teams. Set by setupModel()
+        self.speedEstimate = None # (mean, stdev) of the speed of this team, if known better than its type's
+        self.notBefore = None # Earliest time the team can leave its first activity (numpy engine), see forecast
+        self.waits = {} # Waiting times of the current run by activity index, cleared by setup()
+
+    # Mean and standard deviation of the speed of the team in km/h
+    def speedDistribution(self):
+        if self.speedEstimate is not None:
+            return self.speedEstimate
+        return self.typeSpeed
+
+    # Invoked for each run, after the draws of the run are set: speedDraw (standard normal)
+    # and durationDraws (uniform, by activity index), see drawRandomInputs()
+    def setup(self, env):
+        self.env = env
+        mean, stdev = self.speedDistribution()
+        self.speed = mean + stdev * self.speedDraw
+        self.waits.clear()
+        self.endTime = 0
+        self.trace = None # TraceWriter of the run, set by the simpy engine
+
+    # Pickled for worker processes without the environment and trace of the last run
+    def __getstate__(self):
+        return None, slotState(self, ("env", "trace"))
+
+    # Go through course
+    def start(self, env):
+        for distance, element in self.route:
+            if distance: # Handle walking
+                walkingTime = (distance / self.speed) * 60
+                yield self.env.timeout(walkingTime)
+
+            if element is not None: # Handle activities
+                with element.slots.request() as request:
+                    arrivalTime = env.now # Line up at activity
+                    element.updateMaxQueue()
+                    element.updateOccupancy(env.now, 1, 0)
+                    if self.trace is not None:
+                        self.trace.enqueue(env.now, element.index, self.index)
+                    yield request # Wait for turn
+                    self.waits[element.index] = env.now - arrivalTime
+                    element.updateOccupancy(env.now, -1, 1)
+                    if self.trace is not None:
+                        self.trace.start(env.now, element.index, self.index)
+                    yield env.process(element.acceptTeam(self)) # Do activity
+                    element.updateOccupancy(env.now, 0, -1)
+                    if self.trace is not None:
+                        self.trace.depart(env.now, element.index, self.index)
+                    self.env.timeout(tActivityBuffer) # Extra buffer for activity
+        self.endTime = env.now
+
+    # Store statistics of the run in the result arrays
+    def persistStats(self, results, run):
+        for i, waitTime in self.waits.items():
+            results.waits[run, self.index, i] = waitTime
+        results.endTime[run, self.index] = self.endTime
+
+# Slots of a slotted object that are set, except those left out, as pickled by __getstate__()
+def slotState(obj, leftOut):
+    return {name: getattr(obj, name) for name in obj.__slots__ if name not in leftOut and hasattr(obj, name)}
+
+# start: dict with groupStartTimes, tStartSimul and tStartInterval, and optionally the team types
+# and speeds of the scenario, see scenarioParameters(). Defaults to the module settings
+def startTeams(teamType, numberOfTeams, Teams, course, start=None):
+    if start is None:
+        start = startParameters()
+    startGroup = start["tStartSimul"][teamType]
+    startTime = start["groupStartTimes"][teamType]
+    types = start.get("teamTypes")
+    typeSpeed = (start["meanSpeed"][teamType], start["stdevSpeed"][teamType]) if "meanSpeed" in start else None
+    for j in range(numberOfTeams):
+        Teams.append(Team("Hold %d (%s)" % (j,teamType), teamType, course[teamType], startTime, types, typeSpeed))
+        if j % startGroup == startGroup - 1:
+            startTime += start["tStartInterval"]
+        j += 1
+    return Teams
+
+# Copy of the module start settings, for startTeams()
+def startParameters():
+    return {"groupStartTimes": dict(groupStartTimes), "tStartSimul": dict(tStartSimul),
+            "tStartInterval": tStartInterval}
+
+def scenarioParameters(courseTeamTypes=None):
+    """startParameters() with the team types of a scenario and their speeds: the built-in team types,
+    then those a course declares as {team type: {meanSpeed, stdevSpeed, groupStartTime, tStartSimul}},
+    see loadCourse(). A course may also change the parameters of a built-in team type.
+    The module settings are not changed"""
+    start = startParameters()
+    start.update(teamTypes=list(teamTypes), meanSpeed=dict(meanSpeed), stdevSpeed=dict(stdevSpeed))
+    for teamType, parameters in (courseTeamTypes or {}).items():
+        if teamType not in start["teamTypes"]:
+            start["teamTypes"].append(teamType)
+        for name in ("meanSpeed", "stdevSpeed", "tStartSimul"):
+            start[name][teamType] = parameters[name]
+        start["groupStartTimes"][teamType] = parameters["groupStartTime"]
+    return start
+
+# Team types of a scenario, indexed by Team.typeIndex: those of its teams, or the built-in ones
+def scenarioTeamTypes(Teams):
+    return list(Teams[0].teamTypes) if Teams else list(teamTypes)
+
+def compileRoute(course, choices=False):
+    """Flatten a course [act1, distance1, act2, ...] to a list of (distance, activity) steps.
+    distance is walked before the activity. A trailing distance gets activity None.
+    A Choice in the course becomes a (distance, Choice) step with choices, and the steps of its
+    branches in the order given without"""
+    steps = []
+    distance = 0
+    for element in course:
+        if isinstance(element, numbers.Number):
+            distance += element
+        if type(element) is Activity:
+            steps.append((distance, element))
+            distance = 0
+        if isinstance(element, Choice):
+            if choices:
+                steps.append((distance, element))
+            else:
+                steps += element.fixedSteps(distance)
+            distance = 0
+    if distance:
+        steps.append((distance, None))
+    return steps
+
+# Description of route steps for fingerprints and checkpoints, with activities by index
+def routeKey(steps):
+    return [(distance, a.key() if isinstance(a, Choice) else a.index if a is not None else None)
+            for distance, a in steps]
+
+def setupModel(noOfTeams, overrides=None, courseName="default"):
+    """Build activities, course and teams for a simulation.
+    noOfTeams: number of teams per team type, e.g. {"V": 27, "S": 14, "OB": 20}. Team types not
+    given get no teams
+    courseName: built-in course or course file, see loadCourse()
+    overrides: changes to the model as {parameter: value}, where parameter is one of
+    "capacity.<activity name>", "minDuration.<activity name>", "maxDuration.<activity name>",
+    "groupStartTimes.<team type>", "tStartSimul.<team type>", "tStartInterval" or
+    "teams.<team type>" (no. of teams, instead of the one in noOfTeams).
+    The team types are the built-in ones and those the course declares, see scenarioParameters().
+    Teams are indexed in the order they are created and then sorted by start time"""
+    Activities, course, courseTeamTypes = loadCourse(courseName)
+    start = scenarioParameters(courseTeamTypes)
+    types = start["teamTypes"]
+    noOfTeams = dict(noOfTeams)
+    activityByName = {a.name: a for a in Activities}
+    for parameter, value in (overrides or {}).items():
+        name, _, member = parameter.partition(".")
+        if name in ("capacity", "minDuration", "maxDuration") and member in activityByName:
+            setattr(activityByName[member], name, value)
+        elif name in ("groupStartTimes", "tStartSimul") and member in types:
+            start[name][member] = value
+        elif name == "tStartInterval":
+            start[name] = value
+        elif name == "teams" and member in types:
+            noOfTeams[member] = value
+        else:
+            raise ValueError("Unknown parameter: %s" % parameter)
+    for teamType in noOfTeams:
+        if teamType not in types:
+            raise ValueError("Unknown team type: %s" % teamType)
+        if noOfTeams[teamType] and teamType not in course:
+            raise ValueError("The course has no route for team type %s" % teamType)
+
+    ## New start logic. Start each group at a fixed time
+    Teams = []
+    for teamType in types:
+        if noOfTeams.get(teamType):
+            Teams = startTeams(teamType, noOfTeams[teamType], Teams, course, start)
+    for n, t in enumerate(Teams):
+        t.index = n
+    Teams.sort(key=lambda x: x.startTime)
+    for i, a in enumerate(Activities):
+        a.index = i
+        a.noOfTeamTypes = len(types)
+    return Teams, Activities, course
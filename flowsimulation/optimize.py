@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Search for start schedules: values of groupStartTimes, tStartSimul and tStartInterval that keep
+the waits, the late finishes and the queues at the bottleneck posts down.
+
+The search is successive halving: many candidate schedules get a few screening runs, the better
+half of them twice as many, and so on until one is left or the full number of runs is reached.
+All candidates run on the same seeds (common random numbers), so they are ranked on equal draws
+and a few runs are enough to drop the poor ones"""
+
+import math
+import multiprocessing
+import random
+import time
+import numpy
+from .model import tEnd, setupModel, scenarioParameters
+from .courses import loadCourse
+from .sampling import runSeeds
+from .runner import runSimulations
+
+def startSpace(shift=60, step=15, maxSimul=6, intervals=(5, 10, 15, 20, 25), courseName="default", overrides=None):
+    """Values to search per start parameter, as axes for parameterGrid(): group start times within
+    shift minutes of the current ones in steps of step minutes, 1 to maxSimul teams starting at
+    once per team type of the course, and the given intervals between starts.
+    overrides: changes to the model, whose group start times are the current ones"""
+    start = courseStart(courseName, overrides)
+    axes = {}
+    for teamType in start["teamTypes"]:
+        startTime = start["groupStartTimes"][teamType]
+        axes["groupStartTimes.%s" % teamType] = list(range(startTime - shift, startTime + shift + 1, step))
+    for teamType in start["teamTypes"]:
+        axes["tStartSimul.%s" % teamType] = list(range(1, maxSimul + 1))
+    axes["tStartInterval"] = list(intervals)
+    return axes
+
+# Start parameters of the scenario: those of the course, with the start parameters in overrides
+# (see setupModel()) applied
+def courseStart(courseName="default", overrides=None):
+    start = scenarioParameters(loadCourse(courseName)[2])
+    for parameter, value in (overrides or {}).items():
+        name, _, member = parameter.partition(".")
+        if name in ("groupStartTimes", "tStartSimul") and member in start[name]:
+            start[name][member] = value
+        elif name == "tStartInterval":
+            start[name] = value
+    return start
+
+# The current start parameters as a candidate, in the names of startSpace()
+def currentStart(courseName="default", overrides=None):
+    start = courseStart(courseName, overrides)
+    candidate = {}
+    for name in ("groupStartTimes", "tStartSimul"):
+        for teamType in start["teamTypes"]:
+            candidate["%s.%s" % (name, teamType)] = start[name][teamType]
+    candidate["tStartInterval"] = start["tStartInterval"]
+    return candidate
+
+# noOfCandidates different candidates: the current start parameters, then random points of axes.
+# Fewer if axes has fewer points
+def sampleCandidates(axes, noOfCandidates, seed=1, courseName="default", overrides=None):
+    draw = random.Random(seed)
+    current = currentStart(courseName, overrides)
+    candidates = [current]
+    size = math.prod(len(values) for values in axes.values())
+    if set(current) != set(axes) or any(current[name] not in values for name, values in axes.items()):
+        size += 1 # The current start parameters are not a point of axes
+    while len(candidates) < min(noOfCandidates, size):
+        candidate = {name: draw.choice(values) for name, values in axes.items()}
+        if candidate not in candidates:
+            candidates.append(candidate)
+    return candidates
+
+# Worker entry point. Simulates a candidate on seeds and returns its per-run measures
+def runCandidate(args):
+    candidate, overrides, noOfTeams, seeds, engine, courseName = args
+    Teams, Activities, course = setupModel(noOfTeams, dict(overrides or {}, **candidate), courseName)
+    results = runSimulations(Teams, Activities, seeds, engine)
+    return {"totalWaits": numpy.nansum(results.waits, axis=(1, 2)),
+            # Teams that did not finish count as finishing at tEnd
+            "finishes": numpy.where(results.endTime == 0, tEnd, results.endTime),
+            "maxQueues": results.maxQueue.astype(float)}
+
+# Append the measures of more runs of a candidate
+def addRuns(measures, newMeasures):
+    if measures is None:
+        return newMeasures
+    return {name: numpy.concatenate([values, newMeasures[name]]) for name, values in measures.items()}
+
+def scoreCandidate(measures, bottlenecks, waitWeight=1.0, finishWeight=2.0, queueWeight=30.0,
+                   unfinishedWeight=120.0):
+    """Objective of a candidate from its per-run measures: mean total wait per run (team minutes)
+    + finishWeight x p95 of the team finish times + queueWeight x mean over the runs of the longest
+    max queue at the bottleneck activities (indices) + unfinishedWeight x mean no. of teams per run
+    that do not finish before tEnd (their waits after tEnd are not counted). Lower is better.
+    Returns a summary row"""
+    totalWait = measures["totalWaits"].mean()
+    p95Finish = numpy.percentile(measures["finishes"], 95)
+    bottleneckQueue = measures["maxQueues"][:, bottlenecks].max(axis=1).mean() if bottlenecks else 0.0
+    unfinished = (measures["finishes"] >= tEnd).sum(axis=1).mean()
+    return {"objective": (waitWeight * totalWait + finishWeight * p95Finish + queueWeight * bottleneckQueue
+                          + unfinishedWeight * unfinished),
+            "totalWait": totalWait, "p95Finish": p95Finish, "bottleneckQueue": bottleneckQueue,
+            "unfinished": unfinished, "runs": len(measures["totalWaits"])}
+
+def optimizeStart(noOfRuns, noVTeams, noSTeams, noOBTeams, noOfCandidates=64, screeningRuns=25, seed=1,
+                  workers=1, timeLimit=None, axes=None, bottlenecks=None, waitWeight=1.0, finishWeight=2.0,
+                  queueWeight=30.0, unfinishedWeight=120.0, overrides=None, courseName="default", engine="numpy"):
+    """Search start parameters by successive halving, see the module docstring.
+    noOfCandidates: schedules to screen, the current one and random points of axes (default startSpace())
+    screeningRuns: runs per candidate in the first round. Each round doubles the runs of the better half,
+    up to noOfRuns for the last candidates
+    timeLimit: seconds. No new round is started if it would not end in time, and the best candidate
+    so far is returned
+    bottlenecks: names of the activities whose max queue counts in the objective. By default the three
+    with the longest mean max queue with the current start parameters
+    waitWeight, finishWeight, queueWeight, unfinishedWeight: weights of the objective, see scoreCandidate()
+    overrides: other changes to the model, kept in every candidate. Start parameters in overrides are
+    taken as the current ones, which the candidates vary. courseName as for simulate().
+    Returns a dict with best and current (rows of the best and the current candidate, compared on
+    the same runs), rows (the candidates of the last round, best first), rounds (candidates, runs and
+    seconds per round) and bottlenecks. Rows hold the variant (start parameters) and the summary of
+    scoreCandidate()"""
+    startTime = time.perf_counter()
+    noOfTeams = {"V": noVTeams, "S": noSTeams, "OB": noOBTeams}
+    if axes is None:
+        axes = startSpace(courseName=courseName, overrides=overrides)
+    candidates = sampleCandidates(axes, noOfCandidates, seed, courseName, overrides)
+    measures = [None] * len(candidates)
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        survivors = list(range(len(candidates)))
+        runs, doneRuns, rounds = min(screeningRuns, noOfRuns), 0, []
+        while True:
+            roundStart = time.perf_counter()
+            newRuns = runs - doneRuns
+            seeds = runSeeds(seed, doneRuns, newRuns)
+            args = [(candidates[c], overrides, noOfTeams, seeds, engine, courseName) for c in survivors]
+            newMeasures = pool.map(runCandidate, args) if pool is not None else map(runCandidate, args)
+            for c, candidateMeasures in zip(survivors, newMeasures):
+                measures[c] = addRuns(measures[c], candidateMeasures)
+            doneRuns = runs
+            if not rounds: # The current start parameters are candidate 0
+                activityNames = [a.name for a in setupModel(noOfTeams, overrides, courseName)[1]]
+                if bottlenecks is None:
+                    meanQueues = measures[0]["maxQueues"].mean(axis=0)
+                    bottlenecks = [activityNames[i] for i in numpy.argsort(-meanQueues, kind="stable")[:3]]
+                bottleneckIndices = [activityNames.index(name) for name in bottlenecks]
+            scores = {c: scoreCandidate(measures[c], bottleneckIndices, waitWeight, finishWeight, queueWeight,
+                                        unfinishedWeight)
+                      for c in survivors}
+            survivors.sort(key=lambda c: scores[c]["objective"])
+            rounds.append({"candidates": len(survivors), "runs": runs, "seconds": time.perf_counter() - roundStart})
+            if len(survivors) == 1 or runs >= noOfRuns:
+                break
+            nextSurvivors = survivors[:math.ceil(len(survivors) / 2)]
+            nextRuns = min(2 * runs, noOfRuns)
+            # Time per run of a candidate in this round, for the time the next round would take
+            secondsPerRun = rounds[-1]["seconds"] / (len(survivors) * newRuns)
+            if timeLimit is not None and (time.perf_counter() - startTime
+                                          + secondsPerRun * len(nextSurvivors) * (nextRuns - runs)) > timeLimit:
+                break
+            survivors, runs = nextSurvivors, nextRuns
+        if 0 not in survivors: # Run the current start parameters as far as the best, to compare on the same runs
+            seeds = runSeeds(seed, len(measures[0]["totalWaits"]), runs - len(measures[0]["totalWaits"]))
+            measures[0] = addRuns(measures[0], runCandidate((candidates[0], overrides, noOfTeams, seeds, engine,
+                                                             courseName)))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    rows = [dict(scores[c], variant=candidates[c]) for c in survivors]
+    current = dict(scoreCandidate(measures[0], bottleneckIndices, waitWeight, finishWeight, queueWeight,
+                                  unfinishedWeight),
+                   variant=candidates[0])
+    return {"best": rows[0], "current": current, "rows": rows, "rounds": rounds, "bottlenecks": bottlenecks}
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Instrumentation of simulate(): wall time per phase, events per second, run durations,
+peak memory and optional cProfile statistics of the simulation runs"""
+
+import contextlib
+import cProfile
+import sys
+import time
+try:
+    import resource # Not available on Windows
+except ImportError:
+    resource = None
+
+# Phases of simulate(), in reporting order
+phases = ["setup", "run", "persist", "summarize", "plot"]
+
+class Profile(object):
+    """Measurements of a simulation, switched on by passing a Profile to simulate().
+    phaseTimes: wall time in seconds per phase. "persist" (copying the state of the teams and
+    activities to the result arrays) is part of "run" and is also counted separately.
+    runTimes: wall time of each run. The numpy engine runs all seeds at once, so each of its runs
+    gets an equal share. events: events processed by the engines, see the engines dict.
+    cProfileOutput: file to write cProfile statistics of the "run" phase to, for pstats or snakeviz.
+    Only the main process is profiled, so use workers=1 to see the engines"""
+
+    def __init__(self, cProfileOutput=None):
+        self.phaseTimes = dict.fromkeys(phases, 0.0)
+        self.runTimes = []
+        self.events = 0
+        self.engineTime = 0.0 # Time spent in the engines, for events per second
+        self.cProfileOutput = cProfileOutput
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        profiler = None
+        if name == "run" and self.cProfileOutput is not None:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phaseTimes[name] = self.phaseTimes.get(name, 0.0) + time.perf_counter() - startTime
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(self.cProfileOutput)
+
+    # Record noOfRuns runs that took seconds in an engine and processed the given no. of events
+    def addRuns(self, noOfRuns, seconds, events):
+        self.runTimes.extend([seconds / noOfRuns] * noOfRuns)
+        self.engineTime += seconds
+        self.events += events
+
+    # Add the measurements of a worker process
+    def merge(self, other):
+        for name, seconds in other.phaseTimes.items():
+            if name != "run": # The run phase of the workers overlaps the run phase here
+                self.phaseTimes[name] = self.phaseTimes.get(name, 0.0) + seconds
+        self.runTimes.extend(other.runTimes)
+        self.engineTime += other.engineTime
+        self.events += other.events
+
+    def eventsPerSecond(self):
+        return self.events / self.engineTime if self.engineTime else 0.0
+
+    # Peak resident memory in MB of this process and of its finished worker processes, None if unknown
+    def peakMemory(self):
+        if resource is None:
+            return None, None
+        scale = 1024 ** 2 if sys.platform == "darwin" else 1024 # ru_maxrss is in bytes on macOS, kB elsewhere
+        return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+# Context manager timing a phase of profile, or doing nothing if profile is None
+def phase(profile, name):
+    return profile.phase(name) if profile is not None else contextlib.nullcontext()
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""Text and plot output. matplotlib is imported when a plot is made, not with the package"""
+
+import os
+import numbers
+import numpy
+from .model import Activity, Choice, tEnd, scenarioTeamTypes
+from .results import minMaxAvg
+
+def formatTime(timestamp):
+    if timestamp is None:
+        return 0
+    hour = timestamp / 60
+    min = timestamp % 60
+    return "%02d:%02d" % (hour, min)
+
+def printCourse(course, courseName, noTeams):
+    outputStr = "%s (%d hold):\n" % (courseName, noTeams)
+    totalDistance = 0
+    for element in course:
+        if isinstance(element, numbers.Number):
+            outputStr += "-(%.1f)->" % element
+            totalDistance += element
+        if type(element) is Activity:
+            outputStr += "%s[%d]" % (element.name, element.capacity)
+        if isinstance(element, Choice): # Distance as walked in the order given
+            outputStr += formatChoice(element)
+            totalDistance += sum(distance for distance, a in element.fixedSteps(0))
+    outputStr += "\nTotal distance: %.1f" % totalDistance
+    return outputStr
+
+# Choice as {A[5] & B[5]} (any order) or {A[5] | B[5]} (one of)
+def formatChoice(choice):
+    branches = []
+    for branch in choice.branches:
+        text = ""
+        for distance, a in branch:
+            if distance:
+                text += "-(%.1f)->" % distance
+            text += formatChoice(a) if isinstance(a, Choice) else "%s[%d]" % (a.name, a.capacity)
+        branches.append(text)
+    if choice.anyOrder:
+        return "{%s}" % (" & ".join(branches) + (" %.1f apart" % choice.distance if choice.distance else ""))
+    return "{%s}" % " | ".join(branches)
+
+# Returns result of minMaxAvg(list) as a single string
+def minMaxAvgFormat(list):
+    mma = minMaxAvg(list)
+    return "(%d/%d/%.2f)" % (mma[0], mma[1], mma[2])
+
+# Return result of minMaxAvg(list) as a single string with values formatted as time
+def minMaxAvgTime(list):
+    return formatMinMaxAvgTime(minMaxAvg(list))
+
+# Return [5th percentile, 95th percentile, average] as a single string with values formatted as time
+def formatMinMaxAvgTime(mma):
+    return "(%s/%s/%s)" \
+        % (formatTime(mma[0]), formatTime(mma[1]), formatTime(mma[2]))
+
+# Aggregates the rows (runs) by sum and returns result of minMaxAvgTime() on the aggregates
+def minMaxAvgSumPerRun(runs):
+    """Find min/max/avg of aggregated (summed) rows. nan values are skipped"""
+    return minMaxAvgTime(numpy.nansum(runs, axis=1))
+
+# Aggregates the rows (runs) by average and returns result of minMaxAvgTime() on the aggregates
+def minMaxAvgAvgPerRun(runs):
+    """Find min/max/avg of aggregated (averaged) rows. nan values are skipped, empty rows count as 0"""
+    counts = numpy.count_nonzero(~numpy.isnan(runs), axis=1)
+    return minMaxAvgTime(numpy.nansum(runs, axis=1) / numpy.maximum(counts, 1))
+
+# Find the [0.05;0.95] interval for opening time of an activity
+def startCloseTime(results, act: Activity):
+    p5StartTime, p95CloseTime = results.startCloseTime(act)
+    return [formatTime(p5StartTime), formatTime(p95CloseTime)]
+
+# Colour of each team type in the Gantt chart. Other team types get the colours of the matplotlib cycle
+teamTypeColors = {"V": "blue", "S": "orange", "OB": "gray"}
+
+# Name of the route of each team type, in printed courses and plot titles
+routeNames = {"V": "Væbnerrute", "S": "Seniorrute", "OB": "OB-rute"}
+
+# The course of each team type of the course, as printCourse() texts
+def printCourses(Teams, course):
+    return [printCourse(course[teamType], routeNames.get(teamType, teamType),
+                        sum(t.teamType == teamType for t in Teams))
+            for teamType in scenarioTeamTypes(Teams) if teamType in course]
+
+def plotActivityStats(activities, results, title, output=None, startTime=None):
+    """Boxplot of max queues and Gantt chart of opening/closing times per activity.
+    output: None to show the figures, or a file name such as "report.png" or "report.svg".
+    The figures are then rendered without a display to report-maxqueue.png and report-gantt.png,
+    and the list of written files is returned.
+    startTime: start of the time axis of the Gantt chart, e.g. the first start of a team of the
+    scenario. Defaults to the earliest opening of an activity"""
+    noOfRuns = results.noOfRuns
+    labels = ["%s (%.2f hold),\nKapacitet=%d, [%s;%s]" %
+              (a.name, results.meanTeamsArrived(a), a.capacity, a.minDuration, a.maxDuration)
+              for a in activities]
+    # (activities x team types x 4): start at the 5,10,25,50th, end at the 95,90,75,50th percentile
+    starts, ends = results.allStartEndPercentiles()
+    starts, ends = starts[[a.index for a in activities]], ends[[a.index for a in activities]]
+    maxQueueStats = results.allMaxQueueStats()
+    dataMaxQueue = [dict(maxQueueStats[a.index], label=label) for a, label in zip(activities, labels)]
+
+    # matplotlib takes most of a second to import, so only load it here
+    import matplotlib.figure
+    import matplotlib.ticker
+    import matplotlib.collections
+    import matplotlib.patches as mpatches
+    if output is None:
+        import matplotlib.pyplot as pyplot
+        figQueue, figGantt = pyplot.figure(), pyplot.figure()
+    else: # Figures without a pyplot window, rendered by savefig
+        figQueue, figGantt = matplotlib.figure.Figure(figsize=(12, 12)), matplotlib.figure.Figure(figsize=(12, 12))
+
+    # Plot max queue/activity as boxplot
+    axQueue = figQueue.add_subplot(111)
+    axQueue.bxp(dataMaxQueue[::-1], vert=False)
+    axQueue.set_title("Længste kø pr. post (%d gennemløb)" % noOfRuns)
+    axQueue.grid(True)
+
+    # Plot activity start/end times as Gantt chart, one collection of bars per team type and percentile
+    figgantt = figGantt.add_subplot(111)
+    y = len(activities) - 0.5 - numpy.arange(len(activities))
+    for k, teamType in enumerate(results.teamTypes):
+        color = teamTypeColors.get(teamType, "C%d" % k)
+        for level in range(4):
+            left, right = starts[:, k, level], ends[:, k, level]
+            bars = numpy.stack([numpy.column_stack([left, y - 0.4]), numpy.column_stack([left, y + 0.4]),
+                                numpy.column_stack([right, y + 0.4]), numpy.column_stack([right, y - 0.4])],
+                               axis=1)
+            if level == 3: # 50th percentile
+                figgantt.add_collection(matplotlib.collections.PolyCollection(
+                    bars, alpha=0.3, facecolor=color, edgecolor='red', zorder=100))
+            else: # 5th/95th, 10th/90th and 25th/75th percentile
+                figgantt.add_collection(matplotlib.collections.PolyCollection(
+                    bars, alpha=0.3, facecolor=color, edgecolor='none'))
+
+    patch5_95 = mpatches.Patch(alpha=0.3, label='95%')
+    patch10_90 = mpatches.Patch(alpha=0.45, label='90%')
+    patch25_75 = mpatches.Patch(alpha=0.6, label='75%')
+    patch50 = mpatches.Patch(alpha=0.75, edgecolor='red', label='50%')
+    figgantt.legend(handles=[patch5_95, patch10_90, patch25_75, patch50], loc=1)
+
+    figgantt.set_yticks(numpy.arange(0.5, len(activities) + 0.5), labels[::-1])
+    figgantt.set_ylim(0, len(activities))
+    if startTime is None:
+        startTime = starts[starts > 0].min(initial=tEnd)
+    figgantt.set_xlim(startTime, max(tEnd, ends[:, :, 0].max(initial=0)))
+    figgantt.xaxis.set_major_locator(matplotlib.ticker.MultipleLocator(60))
+    figgantt.xaxis.set_major_formatter(
+        matplotlib.ticker.FuncFormatter(lambda x, pos: formatTime(x)))
+    figgantt.set_title("Åbne- og lukketider pr. post")
+    figgantt.grid(True)
+
+    if output is None:
+        pyplot.show()
+        return []
+    base, extension = os.path.splitext(output)
+    paths = [base + "-maxqueue" + (extension or ".png"), base + "-gantt" + (extension or ".png")]
+    for fig, path in zip([figQueue, figGantt], paths):
+        fig.subplots_adjust(left=0.22, right=0.97, top=0.96, bottom=0.04) # Room for the activity labels
+        fig.savefig(path)
+    return paths
+
+def printSweep(rows, noOfQueues=3):
+    """Print the rows of sweep() as a table, with the noOfQueues activities with the longest max queue"""
+    print("%-40s %10s %18s %10s  %s" % ("Variant", "Total wait", "Diff. (min)", "p95 finish", "Longest max queue"))
+    for row in rows:
+        variant = ", ".join("%s=%s" % item for item in row["variant"].items()) or "(base)"
+        queues = sorted(row["maxQueue"].items(), key=lambda item: -item[1])[:noOfQueues]
+        print("%-40s %10s %+10.1f +-%5.1f %10s  %s"
+              % (variant, formatTime(row["totalWait"]), row["waitDifference"], row["waitDifferenceCI"],
+                 formatTime(row["p95Finish"]), ", ".join("%s %.1f" % queue for queue in queues)))
+
+def printEstimate(estimates):
+    """Print the estimates of analyticEstimate() as a table, marking saturated activities"""
+    print("%-12s %5s %9s %11s %6s %9s %6s %6s" % ("Activity", "Teams", "Teams/h", "Utilization", "Wait", "Max wait",
+                                                 "Open", "Close"))
+    for e in estimates:
+        print("%-12s %5d %9.1f %10.0f%% %6.1f %9.1f %6s %6s%s"
+              % (e["activity"].name, e["teams"], e["arrivalRate"], e["utilization"] * 100, e["wait"], e["maxWait"],
+                 formatTime(e["open"]) if e["open"] is not None else "-",
+                 formatTime(e["close"]) if e["close"] is not None else "-", "  SATURATED" if e["saturated"] else ""))
+
+def printProfile(profile):
+    """Print the measurements of a Profile: time per phase, run durations, events per second and peak memory"""
+    print("Profile:")
+    for name, seconds in profile.phaseTimes.items():
+        print("%12s: %8.3f s" % (name, seconds))
+    if profile.runTimes:
+        runTimes = numpy.array(profile.runTimes) * 1000
+        print("%12s: %d simulated, %.2f ms mean, %.2f ms min, %.2f ms p95, %.2f ms max"
+              % ("runs", len(runTimes), runTimes.mean(), runTimes.min(), numpy.percentile(runTimes, 95),
+                 runTimes.max()))
+    print("%12s: %d, %.0f per second" % ("events", profile.events, profile.eventsPerSecond()))
+    peak, workerPeak = profile.peakMemory()
+    if peak is not None:
+        print("%12s: %.0f MB%s" % ("peak memory", peak, ", %.0f MB in worker processes" % workerPeak if workerPeak else ""))
+    if profile.cProfileOutput is not None:
+        print("%12s: %s" % ("cProfile", profile.cProfileOutput))
+
+def printUtilization(activities, results):
+    """Print the occupancy of each activity over its opening hours (first arrival to last departure),
+    as ratios of the means over the runs: utilization (busy slot time / slot time), mean and max
+    over the runs of the peak share of slots in use, time with all slots in use per run and mean
+    queue length"""
+    means = results.occupancyMeans()
+    print("%-12s %8s %11s %14s %14s %10s" % ("Activity", "Capacity", "Utilization", "Peak mean/max",
+                                              "Saturated/run", "Mean queue"))
+    for a in activities:
+        i = a.index
+        openTime = means["openTime"][i]
+        print("%-12s %8d %10.0f%% %6.0f%%/%5.0f%% %14s %10.2f"
+              % (a.name, a.capacity, 100 * means["busyTime"][i] / (a.capacity * openTime) if openTime else 0,
+                 100 * means["peakBusy"][i] / a.capacity, 100 * means["maxPeakBusy"][i] / a.capacity,
+                 formatTime(means["saturatedTime"][i]), means["queueTime"][i] / openTime if openTime else 0))
+
+def printForecast(forecast):
+    """Print a forecast of Forecaster.forecast(): closing times of the posts and finish times of the teams"""
+    print("Forecast at %s:" % formatTime(forecast["now"]))
+    print("%-12s %9s %10s %10s %11s" % ("Activity", "Remaining", "Close p50", "Close p95", "Last leave"))
+    for p in forecast["posts"]:
+        lastLeave = formatTime(p["lastLeave"]) if p["lastLeave"] is not None else "-"
+        if p["closed"]:
+            print("%-12s %9s %10s %10s %11s" % (p["activity"].name, "closed", "-", "-", lastLeave))
+        else:
+            print("%-12s %9.1f %10s %10s %11s" % (p["activity"].name, p["remaining"], formatTime(p["close50"]),
+                                                 formatTime(p["close95"]), lastLeave))
+    print("%-20s %-20s %10s %10s" % ("Team", "Latest check-in", "Finish p50", "Finish p95"))
+    for t in forecast["teams"]:
+        team = t["team"]
+        if t["checkIn"] is None:
+            checkIn = "-"
+        else:
+            step, time, event = t["checkIn"]
+            checkIn = "%s %s %s" % (event, team.route[step][1].name, formatTime(time))
+        print("%-20s %-20s %10s %10s" % (team.name, checkIn, formatTime(t["finish50"]), formatTime(t["finish95"])))
+
+def printOptimization(optimization, noOfRows=10):
+    """Print the result of optimizeStart(): the rounds, the best noOfRows candidates of the last round
+    and the best start parameters against the current ones"""
+    print("Bottlenecks: %s" % ", ".join(optimization["bottlenecks"]))
+    for k, r in enumerate(optimization["rounds"]):
+        print("Round %d: %d candidates x %d runs, %.1f s" % (k + 1, r["candidates"], r["runs"], r["seconds"]))
+    print("%-10s %10s %10s %10s %16s %10s  %s" % ("", "Objective", "Total wait", "p95 finish", "Bottleneck queue",
+                                                 "Unfinished", "Start parameters"))
+    rows = [("Current", optimization["current"])] + [("#%d" % (k + 1), row)
+                                                     for k, row in enumerate(optimization["rows"][:noOfRows])]
+    for name, row in rows:
+        variant = ", ".join("%s=%s" % (parameter, formatTime(value) if parameter.startswith("groupStartTimes") else value)
+                            for parameter, value in row["variant"].items())
+        print("%-10s %10.0f %10.0f %10s %16.1f %10.1f  %s" % (name, row["objective"], row["totalWait"],
+                                                             formatTime(row["p95Finish"]), row["bottleneckQueue"],
+                                                             row["unfinished"], variant))
+    best, current = optimization["best"], optimization["current"]
+    print("Best against current: total wait %+.0f min/run, p95 finish %+.0f min, bottleneck queue %+.1f"
+          % (best["totalWait"] - current["totalWait"], best["p95Finish"] - current["p95Finish"],
+             best["bottleneckQueue"] - current["bottleneckQueue"]))
@@ -0,0 +1,545 @@
+# -*- coding: utf-8 -*-
+"""Statistics of many runs: raw result arrays, the on-disk cache and store, and constant-memory summaries"""
+
+import hashlib
+import json
+import os
+import numpy
+from .model import tEnd, teamTypes, routeKey, scenarioTeamTypes
+
+# Helper methods for performing calculations on 1- and 2-dimensional arrays
+# Average of a list of numbers
+def avg(list, decimals=2):
+    if len(list) > 0:
+        return round(float(numpy.mean(list)), decimals)
+    return 0
+
+# Returns array with [5th percentile, 95th percentile, average] from a list of numbers
+def minMaxAvg(list):
+    return [numpy.percentile(list,5), numpy.percentile(list,95), avg(list)]
+
+# Occupancy arrays of SimulationResults, see Activity.updateOccupancy()
+occupancyNames = ["busyTime", "queueTime", "saturatedTime", "peakBusy", "openTime"]
+
+class SimulationResults(object):
+    """Statistics of all runs in preallocated arrays
+    waits: (runs x teams x activities), nan where a team did not start the activity
+    firstTeamStart, lastTeamEnd: (runs x activities x teamTypes), 0 where no team of the type came
+    maxQueue: (runs x activities), endTime: (runs x teams), 0 where a team did not finish
+    busyTime, queueTime: (runs x activities) time integrals up to tEnd of the teams in service and
+    of the queue length, saturatedTime: time with all slots in use, peakBusy: most teams in service,
+    openTime: time from the first arrival to the last departure (or tEnd), 0 if no team came
+    teamTypes: team types of the scenario, by type index (default: the built-in ones)"""
+
+    arrayNames = ["waits", "firstTeamStart", "lastTeamEnd", "maxQueue", "endTime",
+                  "busyTime", "queueTime", "saturatedTime", "peakBusy", "openTime"]
+
+    def __init__(self, noOfRuns, noOfTeams, noOfActivities, types=None):
+        self.noOfRuns = noOfRuns
+        self.teamTypes = list(types if types is not None else teamTypes)
+        self.waits = numpy.full((noOfRuns, noOfTeams, noOfActivities), numpy.nan)
+        self.firstTeamStart = numpy.zeros((noOfRuns, noOfActivities, len(self.teamTypes)))
+        self.lastTeamEnd = numpy.zeros((noOfRuns, noOfActivities, len(self.teamTypes)))
+        self.maxQueue = numpy.zeros((noOfRuns, noOfActivities), dtype=int)
+        self.endTime = numpy.zeros((noOfRuns, noOfTeams))
+        self.busyTime = numpy.zeros((noOfRuns, noOfActivities))
+        self.queueTime = numpy.zeros((noOfRuns, noOfActivities))
+        self.saturatedTime = numpy.zeros((noOfRuns, noOfActivities))
+        self.peakBusy = numpy.zeros((noOfRuns, noOfActivities), dtype=int)
+        self.openTime = numpy.zeros((noOfRuns, noOfActivities))
+
+    # Copy the runs of another result set into this one, starting at run no. firstRun
+    def insert(self, firstRun, other):
+        for name in self.arrayNames:
+            getattr(self, name)[firstRun:firstRun + other.noOfRuns] = getattr(other, name)
+
+    # Append the runs of another result set after the runs of this one
+    def extend(self, other):
+        self.noOfRuns += other.noOfRuns
+        for name in self.arrayNames:
+            setattr(self, name, numpy.concatenate([getattr(self, name), getattr(other, name)]))
+
+    # Result set with the first noOfRuns runs of this one
+    def firstRuns(self, noOfRuns):
+        results = SimulationResults(0, 0, 0, self.teamTypes)
+        results.noOfRuns = min(noOfRuns, self.noOfRuns)
+        for name in self.arrayNames:
+            setattr(results, name, getattr(self, name)[:noOfRuns])
+        return results
+
+    def copy(self):
+        results = self.firstRuns(self.noOfRuns)
+        for name in self.arrayNames:
+            setattr(results, name, getattr(results, name).copy())
+        return results
+
+    # Write the arrays to an .npz file
+    def save(self, path):
+        numpy.savez(path, teamTypes=numpy.array(self.teamTypes),
+                    **{name: getattr(self, name) for name in self.arrayNames})
+
+    # (runs x activities) waiting times of a team, nan for activities not started
+    def teamWaits(self, team):
+        return self.waits[:, team.index, :]
+
+    # (runs x teams) waiting times at an activity, nan for teams not started
+    def activityWaits(self, act):
+        return self.waits[:, :, act.index]
+
+    # Number of teams starting an activity in each run
+    def teamsArrived(self, act):
+        return numpy.count_nonzero(~numpy.isnan(self.waits[:, :, act.index]), axis=1)
+
+    # Timestamps of the first team of a type arriving at an activity in each run
+    def firstTeamStarts(self, act, teamType):
+        return self.firstTeamStart[:, act.index, self.teamTypes.index(teamType)]
+
+    # Timestamps of the last team of a type leaving an activity in each run
+    def lastTeamEnds(self, act, teamType):
+        return self.lastTeamEnd[:, act.index, self.teamTypes.index(teamType)]
+
+    # Max queue length at an activity in each run
+    def maxQueues(self, act):
+        return self.maxQueue[:, act.index]
+
+    # End time of a team in each run
+    def endTimes(self, team):
+        return self.endTime[:, team.index]
+
+    # Summaries used by the report. OnlineResults answers the same queries
+
+    # 5th percentile of opening time and 95th percentile of closing time of an activity
+    def startCloseTime(self, act):
+        allStartTimes = self.firstTeamStart[:, act.index, :].ravel()
+        allStartTimes = allStartTimes[allStartTimes != 0] # Remove team types that did not arrive
+        allCloseTimes = self.lastTeamEnd[:, act.index, :].ravel()
+        allCloseTimes = allCloseTimes[allCloseTimes != 0]
+        return (numpy.percentile(allStartTimes, 5) if len(allStartTimes) else 0,
+                numpy.percentile(allCloseTimes, 95) if len(allCloseTimes) else 0)
+
+    # [5, 10, 25, 50] percentiles of opening time and [95, 90, 75, 50] of closing time for a team type
+    def startEndPercentiles(self, act, teamType):
+        return (numpy.percentile(self.firstTeamStarts(act, teamType), [5, 10, 25, 50]),
+                numpy.percentile(self.lastTeamEnds(act, teamType), [95, 90, 75, 50]))
+
+    # startEndPercentiles() of all activities and team types at once, as two (activities x types x 4) arrays
+    def allStartEndPercentiles(self):
+        return (numpy.moveaxis(numpy.percentile(self.firstTeamStart, [5, 10, 25, 50], axis=0), 0, -1),
+                numpy.moveaxis(numpy.percentile(self.lastTeamEnd, [95, 90, 75, 50], axis=0), 0, -1))
+
+    # maxQueueStats() of all activities, with the quartiles of all activities computed at once
+    def allMaxQueueStats(self):
+        q1, med, q3 = numpy.percentile(self.maxQueue, [25, 50, 75], axis=0)
+        inside = (self.maxQueue >= q1 - 1.5 * (q3 - q1)) & (self.maxQueue <= q3 + 1.5 * (q3 - q1))
+        whislo = numpy.where(inside, self.maxQueue, numpy.iinfo(self.maxQueue.dtype).max).min(axis=0)
+        whishi = numpy.where(inside, self.maxQueue, numpy.iinfo(self.maxQueue.dtype).min).max(axis=0)
+        fliers = (self.maxQueue < whislo) | (self.maxQueue > whishi)
+        return [{"q1": q1[i], "med": med[i], "q3": q3[i], "whislo": whislo[i], "whishi": whishi[i],
+                 "fliers": self.maxQueue[fliers[:, i], i]} for i in range(self.maxQueue.shape[1])]
+
+    # Boxplot statistics (as for Axes.bxp) of the max queue at an activity
+    def maxQueueStats(self, act):
+        maxQueues = self.maxQueues(act)
+        q1, med, q3 = numpy.percentile(maxQueues, [25, 50, 75])
+        inside = maxQueues[(maxQueues >= q1 - 1.5 * (q3 - q1)) & (maxQueues <= q3 + 1.5 * (q3 - q1))]
+        return {"q1": q1, "med": med, "q3": q3, "whislo": inside.min(), "whishi": inside.max(),
+                "fliers": maxQueues[(maxQueues < inside.min()) | (maxQueues > inside.max())]}
+
+    # Average number of teams starting an activity per run
+    def meanTeamsArrived(self, act):
+        return avg(self.teamsArrived(act))
+
+    # Means over the runs of the occupancy arrays (busyTime, queueTime, saturatedTime, peakBusy, openTime)
+    # and the max of peakBusy, by activity index
+    def occupancyMeans(self):
+        means = {name: getattr(self, name).mean(axis=0) if self.noOfRuns else numpy.zeros(self.busyTime.shape[1])
+                 for name in occupancyNames}
+        means["maxPeakBusy"] = self.peakBusy.max(axis=0) if self.noOfRuns else numpy.zeros(self.peakBusy.shape[1])
+        return means
+
+    # [5th percentile, 95th percentile, average] of the end time of a team
+    # Teams that did not finish count as finishing at tEnd
+    def endTimeSummary(self, team):
+        endTimes = self.endTimes(team)
+        return minMaxAvg(numpy.where(endTimes == 0, tEnd, endTimes))
+
+    # [5th percentile, 95th percentile, average] of the total wait of a team per run
+    def waitSumSummary(self, team):
+        return minMaxAvg(numpy.nansum(self.teamWaits(team), axis=1))
+
+    # [5th percentile, 95th percentile, average] of the average wait of a team per run
+    def waitAvgSummary(self, team):
+        waits = self.teamWaits(team)
+        counts = numpy.count_nonzero(~numpy.isnan(waits), axis=1)
+        return minMaxAvg(numpy.nansum(waits, axis=1) / numpy.maximum(counts, 1))
+
+# Read a result set written by SimulationResults.save()
+def loadResults(path):
+    results = SimulationResults(0, 0, 0)
+    with numpy.load(path) as arrays:
+        for name in SimulationResults.arrayNames:
+            setattr(results, name, arrays[name])
+        if "teamTypes" in arrays: # Files written before team types were saved have the built-in ones
+            results.teamTypes = [str(teamType) for teamType in arrays["teamTypes"]]
+    results.noOfRuns = len(results.endTime)
+    return results
+
+class ResultCache(object):
+    """On-disk cache of SimulationResults, one .npz file per scenario fingerprint.
+    The least recently used files are removed when the cache grows beyond maxBytes"""
+
+    def __init__(self, directory=".flowsimulation-cache", maxBytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    # Cached results for a fingerprint, or None
+    def load(self, key):
+        path = self.path(key)
+        try:
+            results = loadResults(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        os.utime(path) # Mark as recently used
+        return results
+
+    def store(self, key, results):
+        path = self.path(key)
+        temporaryPath = path + ".%d.tmp.npz" % os.getpid()
+        results.save(temporaryPath)
+        os.replace(temporaryPath, path)
+        self.evict()
+
+    # Remove least recently used files until the cache fits in maxBytes
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz") and not name.endswith(".tmp.npz"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries)[:-1]: # Always keep the newest
+            if total <= self.maxBytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+class ResultStore(object):
+    """Runs of one scenario appended in chunks to a directory, so long batches keep only one chunk
+    in memory and can be resumed after an interruption. Each chunk is a SimulationResults .npz file.
+    manifest.json lists the scenario fingerprint and the completed chunks. A chunk counts once the
+    manifest lists it, and both are replaced atomically, so an interrupted write loses at most the
+    chunk being written"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.path("manifest.json"), encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {"fingerprint": None, "noOfTeams": 0, "noOfActivities": 0, "chunks": []}
+        self.manifest.setdefault("teamTypes", list(teamTypes))
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    @property
+    def noOfRuns(self):
+        return sum(chunk["noOfRuns"] for chunk in self.manifest["chunks"])
+
+    def begin(self, key, noOfTeams, noOfActivities, types=None):
+        """Start or resume the scenario with fingerprint key (see scenarioFingerprint()) and team types
+        types (default: the built-in ones). Returns the number of runs already stored.
+        Raises ValueError if the store holds another scenario"""
+        if self.manifest["fingerprint"] is None:
+            self.manifest.update(fingerprint=key, noOfTeams=noOfTeams, noOfActivities=noOfActivities,
+                                 teamTypes=list(types if types is not None else teamTypes))
+            self.writeManifest()
+        elif self.manifest["fingerprint"] != key:
+            raise ValueError("%s holds the results of another scenario" % self.directory)
+        return self.noOfRuns
+
+    def append(self, results):
+        name = "chunk-%06d.npz" % len(self.manifest["chunks"])
+        temporaryPath = self.path(name + ".tmp.npz")
+        results.save(temporaryPath)
+        os.replace(temporaryPath, self.path(name))
+        self.manifest["chunks"].append({"file": name, "firstRun": self.noOfRuns, "noOfRuns": results.noOfRuns})
+        self.writeManifest()
+
+    def writeManifest(self):
+        temporaryPath = self.path("manifest.json.tmp")
+        with open(temporaryPath, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(temporaryPath, self.path("manifest.json"))
+
+    # The stored chunks as SimulationResults, one at a time
+    def chunks(self):
+        for chunk in self.manifest["chunks"]:
+            yield loadResults(self.path(chunk["file"]))
+
+    def results(self):
+        return StoredResults(self)
+
+class StoredResults(SimulationResults):
+    """Report view of a ResultStore. The per-run arrays of SimulationResults are read from the chunks,
+    except waits: the (runs x teams x activities) waits are reduced chunk by chunk to the teams arriving
+    at each activity and the total and count of waits of each team, so memory grows with runs x
+    (activities + teams) only. The summaries are exact, but waits, teamWaits() and activityWaits()
+    are not available"""
+
+    def __init__(self, store):
+        SimulationResults.__init__(self, 0, store.manifest["noOfTeams"], store.manifest["noOfActivities"],
+                                   store.manifest["teamTypes"])
+        self.waits = None
+        arrived, waitSums, waitCounts = [], [], []
+        parts = {name: [getattr(self, name)] for name in self.arrayNames if name != "waits"}
+        for chunk in store.chunks():
+            for name in parts:
+                parts[name].append(getattr(chunk, name))
+            started = ~numpy.isnan(chunk.waits)
+            arrived.append(numpy.count_nonzero(started, axis=1))
+            waitSums.append(numpy.nansum(chunk.waits, axis=2))
+            waitCounts.append(numpy.count_nonzero(started, axis=2))
+            self.noOfRuns += chunk.noOfRuns
+        for name, arrays in parts.items():
+            setattr(self, name, numpy.concatenate(arrays))
+        noOfTeams, noOfActivities = store.manifest["noOfTeams"], store.manifest["noOfActivities"]
+        self.arrived = numpy.concatenate(arrived) if arrived else numpy.zeros((0, noOfActivities), dtype=int)
+        self.waitSums = numpy.concatenate(waitSums) if waitSums else numpy.zeros((0, noOfTeams))
+        self.waitCounts = numpy.concatenate(waitCounts) if waitCounts else numpy.zeros((0, noOfTeams), dtype=int)
+
+    def teamsArrived(self, act):
+        return self.arrived[:, act.index]
+
+    def waitSumSummary(self, team):
+        return minMaxAvg(self.waitSums[:, team.index])
+
+    def waitAvgSummary(self, team):
+        return minMaxAvg(self.waitSums[:, team.index] / numpy.maximum(self.waitCounts[:, team.index], 1))
+
+def scenarioFingerprint(Teams, Activities, seed, engine, sampling="plain"):
+    """Hash of everything that determines the results of a run, apart from the number of runs:
+    activities, routes and start times of the teams, speed distributions, tEnd, seed, engine
+    and sampling scheme"""
+    scenario = {
+        "activities": [(a.name, a.capacity, a.minDuration, a.maxDuration) for a in Activities],
+        "teams": sorted((t.index, t.name, t.teamType, t.startTime, t.speedDistribution(), t.notBefore,
+                         routeKey(t.dynamicRoute if engine == "dynamic" else t.route))
+                        for t in Teams),
+        "tEnd": tEnd, "teamTypes": scenarioTeamTypes(Teams),
+        "seed": seed, "engine": engine, "sampling": sampling,
+        "draws": 2} # Version of the way runs draw their random inputs
+    return hashlib.sha256(json.dumps(scenario, sort_keys=True).encode("utf-8")).hexdigest()
+
+class P2Quantiles(object):
+    """Streaming quantile estimates with the P-square algorithm (Jain & Chlamtac, 1985).
+    Keeps five markers per estimate, one estimate per entry of percentiles, so memory
+    does not depend on the number of observations. All estimates are updated at once"""
+
+    def __init__(self, percentiles):
+        p = numpy.asarray(percentiles, dtype=float) / 100
+        self.percentiles = p * 100
+        self.count = numpy.zeros(len(p), dtype=int)
+        self.heights = numpy.zeros((len(p), 5))
+        self.positions = numpy.tile(numpy.arange(1.0, 6.0), (len(p), 1))
+        self.desired = numpy.column_stack([numpy.ones_like(p), 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5 * numpy.ones_like(p)])
+        self.increments = numpy.column_stack([numpy.zeros_like(p), p / 2, p, (1 + p) / 2, numpy.ones_like(p)])
+
+    # Add one observation per estimate. Estimates where mask is False are left alone
+    def update(self, values, mask=None):
+        values = numpy.asarray(values, dtype=float)
+        valid = numpy.ones(len(values), dtype=bool) if mask is None else numpy.asarray(mask)
+        # The first five observations are the initial markers
+        filling = valid & (self.count < 5)
+        idx = numpy.nonzero(filling)[0]
+        self.heights[idx, self.count[idx]] = values[idx]
+        self.count[idx] += 1
+        full = idx[self.count[idx] == 5]
+        self.heights[full] = numpy.sort(self.heights[full], axis=1)
+
+        idx = numpy.nonzero(valid & ~filling)[0]
+        if len(idx) == 0:
+            return
+        self.count[idx] += 1
+        x = values[idx]
+        q = self.heights[idx]
+        n = self.positions[idx]
+        q[:, 0] = numpy.minimum(q[:, 0], x)
+        q[:, 4] = numpy.maximum(q[:, 4], x)
+        cell = (x[:, None] >= q[:, 1:4]).sum(axis=1)
+        n += numpy.arange(5) > cell[:, None]
+        desired = self.desired[idx] + self.increments[idx]
+        for i in (1, 2, 3): # Adjust the middle markers towards their desired positions
+            d = desired[:, i] - n[:, i]
+            move = (((d >= 1) & (n[:, i + 1] - n[:, i] > 1))
+                    | ((d <= -1) & (n[:, i - 1] - n[:, i] < -1)))
+            if not move.any():
+                continue
+            sign = numpy.sign(d[move])
+            qm, nm = q[move], n[move]
+            parabolic = qm[:, i] + sign / (nm[:, i + 1] - nm[:, i - 1]) * (
+                (nm[:, i] - nm[:, i - 1] + sign) * (qm[:, i + 1] - qm[:, i]) / (nm[:, i + 1] - nm[:, i])
+                + (nm[:, i + 1] - nm[:, i] - sign) * (qm[:, i] - qm[:, i - 1]) / (nm[:, i] - nm[:, i - 1]))
+            neighbour = numpy.where(sign > 0, i + 1, i - 1)
+            moved = numpy.arange(len(qm))
+            linear = qm[:, i] + sign * (qm[moved, neighbour] - qm[:, i]) / (nm[moved, neighbour] - nm[:, i])
+            q[move, i] = numpy.where((qm[:, i - 1] < parabolic) & (parabolic < qm[:, i + 1]), parabolic, linear)
+            n[move, i] += sign
+        self.heights[idx] = q
+        self.positions[idx] = n
+        self.desired[idx] = desired
+
+    # Current estimates. Exact percentiles below five observations, 0 without observations
+    def quantiles(self):
+        estimates = self.heights[:, 2].copy()
+        for i in numpy.nonzero(self.count < 5)[0]:
+            observed = self.heights[i, :self.count[i]]
+            estimates[i] = numpy.percentile(observed, self.percentiles[i]) if len(observed) else 0
+        return estimates
+
+class RunningStats(object):
+    """Running count, mean, variance, min and max of each column, updated a batch of rows at a time"""
+
+    def __init__(self, size):
+        self.count = numpy.zeros(size)
+        self.mean = numpy.zeros(size)
+        self.m2 = numpy.zeros(size) # Sum of squared deviations from the mean
+        self.min = numpy.full(size, numpy.inf)
+        self.max = numpy.full(size, -numpy.inf)
+
+    # Merge a (rows x size) batch, combining means and variances as in Chan et al.
+    def update(self, values):
+        count = len(values)
+        if count == 0:
+            return
+        mean = values.mean(axis=0)
+        m2 = ((values - mean) ** 2).sum(axis=0)
+        delta = mean - self.mean
+        total = self.count + count
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = numpy.minimum(self.min, values.min(axis=0))
+        self.max = numpy.maximum(self.max, values.max(axis=0))
+
+    def variance(self):
+        return numpy.where(self.count > 1, self.m2 / numpy.maximum(self.count - 1, 1), 0)
+
+class OnlineResults(object):
+    """Summary statistics of all runs in constant memory.
+    Folds in SimulationResults one batch at a time and keeps only P-square quantile
+    estimates and running mean/variance, so the raw samples can be dropped"""
+
+    def __init__(self, noOfTeams, noOfActivities, types=None):
+        self.noOfRuns = 0
+        self.noOfActivities = noOfActivities
+        self.teamTypes = list(types if types is not None else teamTypes)
+        # Values collected once per run: name -> (columns in runValues(), percentiles to estimate)
+        self.layout = {}
+        sizes = [("firstTeamStart", noOfActivities * len(self.teamTypes), [5, 10, 25, 50]),
+                 ("lastTeamEnd", noOfActivities * len(self.teamTypes), [95, 90, 75, 50]),
+                 ("maxQueue", noOfActivities, [25, 50, 75]),
+                 ("teamsArrived", noOfActivities, []),
+                 ("endTime", noOfTeams, [5, 95]),
+                 ("waitSum", noOfTeams, [5, 95]),
+                 ("waitAvg", noOfTeams, [5, 95])]
+        sizes += [(name, noOfActivities, []) for name in occupancyNames]
+        column = 0
+        sources = [] # Column feeding each quantile estimate
+        percentiles = []
+        for name, size, groupPercentiles in sizes:
+            self.layout[name] = (slice(column, column + size), len(percentiles), groupPercentiles)
+            sources.extend(numpy.repeat(numpy.arange(column, column + size), len(groupPercentiles)))
+            percentiles.extend(groupPercentiles * size)
+            column += size
+        self.sources = numpy.array(sources, dtype=int)
+        self.quantileEstimates = P2Quantiles(percentiles)
+        self.stats = RunningStats(column)
+        # Opening and closing times pooled over team types, ignoring types that did not arrive
+        self.startClose = P2Quantiles([5] * noOfActivities + [95] * noOfActivities)
+
+    # (runs x columns) matrix of the per-run values described by layout
+    def runValues(self, results):
+        waits = results.waits
+        counts = numpy.count_nonzero(~numpy.isnan(waits), axis=2)
+        waitSums = numpy.nansum(waits, axis=2)
+        return numpy.column_stack([
+            results.firstTeamStart.reshape(results.noOfRuns, -1),
+            results.lastTeamEnd.reshape(results.noOfRuns, -1),
+            results.maxQueue,
+            numpy.count_nonzero(~numpy.isnan(waits), axis=1),
+            numpy.where(results.endTime == 0, tEnd, results.endTime), # As endTimeSummary() of SimulationResults
+            waitSums,
+            waitSums / numpy.maximum(counts, 1)]
+            + [getattr(results, name) for name in occupancyNames])
+
+    # Fold a batch of runs into the estimates
+    def update(self, results):
+        values = self.runValues(results)
+        self.stats.update(values)
+        for run in range(results.noOfRuns):
+            self.quantileEstimates.update(values[run, self.sources])
+            for k in range(len(self.teamTypes)):
+                startClose = numpy.concatenate([results.firstTeamStart[run, :, k], results.lastTeamEnd[run, :, k]])
+                self.startClose.update(startClose, startClose != 0)
+        self.noOfRuns += results.noOfRuns
+
+    # Quantile estimates of a layout entry as (values x percentiles)
+    def quantiles(self, name):
+        columns, first, percentiles = self.layout[name]
+        size = columns.stop - columns.start
+        estimates = self.quantileEstimates.quantiles()[first:first + size * len(percentiles)]
+        return estimates.reshape(size, len(percentiles))
+
+    # Running mean of a layout entry
+    def mean(self, name):
+        return self.stats.mean[self.layout[name][0]]
+
+    # Running standard deviation of a layout entry
+    def std(self, name):
+        return numpy.sqrt(self.stats.variance()[self.layout[name][0]])
+
+    def startCloseTime(self, act):
+        estimates = self.startClose.quantiles()
+        return estimates[act.index], estimates[self.noOfActivities + act.index]
+
+    def startEndPercentiles(self, act, teamType):
+        row = act.index * len(self.teamTypes) + self.teamTypes.index(teamType)
+        return self.quantiles("firstTeamStart")[row], self.quantiles("lastTeamEnd")[row]
+
+    def allStartEndPercentiles(self):
+        return (self.quantiles("firstTeamStart").reshape(self.noOfActivities, len(self.teamTypes), -1),
+                self.quantiles("lastTeamEnd").reshape(self.noOfActivities, len(self.teamTypes), -1))
+
+    def allMaxQueueStats(self):
+        q1, med, q3 = self.quantiles("maxQueue").T
+        columns = self.layout["maxQueue"][0]
+        whislo = numpy.maximum(self.stats.min[columns], q1 - 1.5 * (q3 - q1))
+        whishi = numpy.minimum(self.stats.max[columns], q3 + 1.5 * (q3 - q1))
+        return [{"q1": q1[i], "med": med[i], "q3": q3[i], "whislo": whislo[i], "whishi": whishi[i], "fliers": []}
+                for i in range(self.noOfActivities)]
+
+    def maxQueueStats(self, act):
+        return self.allMaxQueueStats()[act.index]
+
+    def meanTeamsArrived(self, act):
+        return self.mean("teamsArrived")[act.index]
+
+    def occupancyMeans(self):
+        means = {name: self.mean(name) for name in occupancyNames}
+        means["maxPeakBusy"] = self.stats.max[self.layout["peakBusy"][0]] if self.noOfRuns else means["peakBusy"]
+        return means
+
+    def endTimeSummary(self, team):
+        return list(self.quantiles("endTime")[team.index]) + [self.mean("endTime")[team.index]]
+
+    def waitSumSummary(self, team):
+        return list(self.quantiles("waitSum")[team.index]) + [self.mean("waitSum")[team.index]]
+
+    def waitAvgSummary(self, team):
+        return list(self.quantiles("waitAvg")[team.index]) + [self.mean("waitAvg")[team.index]]
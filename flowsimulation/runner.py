@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+"""Running simulations: seeds, batches, worker processes, adaptive run counts and parameter sweeps"""
+
+import itertools
+import math
+import os
+import statistics
+import time
+import warnings
+import multiprocessing
+import numpy
+from .model import tEnd, setupModel, scenarioTeamTypes
+from .sampling import runSeeds, drawRandomInputs
+from .results import SimulationResults, OnlineResults, scenarioFingerprint
+from .engines import engines, runNumpy, Checkpoint
+from .report import (formatTime, printCourses, formatMinMaxAvgTime, startCloseTime, plotActivityStats, printEstimate,
+                     printProfile, printUtilization, printForecast)
+from .analytic import analyticEstimate
+from .profiling import Profile, phase
+from .trace import TraceWriter
+from .forecasting import Forecaster, readCheckIns
+
+def runSimulations(Teams, Activities, seeds, engine="simpy", checkpoint=None, profile=None, trace=None):
+    """Run one simulation per seed and return the statistics of all runs as SimulationResults.
+    checkpoint: Checkpoint for incremental re-simulation, numpy engine only
+    profile: Profile to record the run times, events and persist time in
+    trace: TraceWriter to log the queue events in, numbering the runs on from the runs already in it"""
+    results = SimulationResults(len(seeds), len(Teams), len(Activities), scenarioTeamTypes(Teams))
+    if engine == "numpy": # Runs all seeds at once
+        startTime = time.perf_counter()
+        noOfEvents = runNumpy(Teams, Activities, seeds, results, checkpoint, trace)
+        if profile is not None and seeds:
+            profile.addRuns(len(seeds), time.perf_counter() - startTime, noOfEvents)
+        if trace is not None:
+            trace.noOfRuns += len(seeds)
+        return results
+    runEngine = engines[engine]
+    normals, uniforms = drawRandomInputs(seeds, len(Teams), len(Activities))
+    for run in range(len(seeds)):
+        for t in Teams:
+            t.speedDraw, t.durationDraws = normals[run, t.index], uniforms[run, t.index]
+        if trace is not None:
+            trace.run = trace.noOfRuns + run
+        startTime = time.perf_counter()
+        noOfEvents = runEngine(Teams, Activities, trace)
+        if profile is not None:
+            profile.addRuns(1, time.perf_counter() - startTime, noOfEvents)
+        with phase(profile, "persist"):
+            for t in Teams:
+                t.persistStats(results, run)
+            for a in Activities:
+                a.persistStats(results, run)
+    if trace is not None:
+        trace.noOfRuns += len(seeds)
+    return results
+
+# Worker process entry point. Runs a chunk of seeds on private copies of teams and activities.
+# Returns the results and the Profile of the chunk, if profiled
+def runChunk(args):
+    Teams, Activities, seeds, engine, profiled = args
+    profile = Profile() if profiled else None
+    return runSimulations(Teams, Activities, seeds, engine, profile=profile), profile
+
+def runCached(cache, Teams, Activities, noOfRuns, seed=1, workers=1, engine="simpy", sampling="plain",
+              profile=None):
+    """Results of the first noOfRuns runs, reusing the runs cached for the same scenario.
+    Only the runs missing from the cache are simulated, and the cache is extended with them"""
+    key = scenarioFingerprint(Teams, Activities, seed, engine, sampling)
+    results = cache.load(key)
+    if results is not None and results.noOfRuns >= noOfRuns:
+        return results.firstRuns(noOfRuns)
+    firstRun = 0 if results is None else results.noOfRuns
+    newResults = runBatch(Teams, Activities, runSeeds(seed, firstRun, noOfRuns - firstRun, sampling), workers, engine,
+                          profile)
+    if results is None:
+        results = newResults
+    else:
+        results.extend(newResults)
+    cache.store(key, results)
+    return results
+
+# Run a batch of seeds, in worker processes if workers > 1. A trace can only be written by one process
+def runBatch(Teams, Activities, seeds, workers=1, engine="simpy", profile=None, trace=None):
+    if workers > 1:
+        if trace is not None:
+            raise ValueError("trace can only be used with workers=1")
+        return runParallel(Teams, Activities, seeds, workers, engine, profile)
+    return runSimulations(Teams, Activities, seeds, engine, profile=profile, trace=trace)
+
+def runParallel(Teams, Activities, seeds, workers, engine="simpy", profile=None):
+    """Spread the runs over a pool of worker processes.
+    Seeds are split in contiguous chunks, and the results are copied back in run order.
+    The profiles of the workers are merged into profile"""
+    results = SimulationResults(len(seeds), len(Teams), len(Activities), scenarioTeamTypes(Teams))
+    noOfChunks = min(len(seeds), workers * 4)
+    chunkSize = -(-len(seeds) // noOfChunks)
+    chunks = [(Teams, Activities, seeds[i:i + chunkSize], engine, profile is not None)
+              for i in range(0, len(seeds), chunkSize)]
+    with multiprocessing.Pool(workers) as pool:
+        for firstRun, (chunkResults, chunkProfile) in zip(range(0, len(seeds), chunkSize), pool.map(runChunk, chunks)):
+            results.insert(firstRun, chunkResults)
+            if profile is not None:
+                profile.merge(chunkProfile)
+    return results
+
+def percentileHalfWidths(results, confidence=0.95, noOfBatches=20):
+    """Half-widths of the confidence intervals of the reported percentiles, by batch means:
+    the runs are split in noOfBatches batches (fewer with fewer runs), each percentile is computed per
+    batch, and the interval is t * stdev / sqrt(noOfBatches) of the batch values. Returns an array with
+    p5 opening time and p95 closing time of each activity, then p5 and p95 end time of each team.
+    Raises ValueError with fewer than 2 runs"""
+    noOfBatches = min(noOfBatches, results.noOfRuns)
+    if noOfBatches < 2:
+        raise ValueError("Confidence intervals need at least 2 runs")
+    batchSize = results.noOfRuns // noOfBatches
+    runs = slice(0, batchSize * noOfBatches)
+    # Pool team types per activity and drop the types that did not arrive, as in startCloseTime()
+    starts = numpy.where(results.firstTeamStart[runs] == 0, numpy.nan, results.firstTeamStart[runs])
+    closes = numpy.where(results.lastTeamEnd[runs] == 0, numpy.nan, results.lastTeamEnd[runs])
+    starts = starts.reshape(noOfBatches, batchSize, starts.shape[1], -1).swapaxes(2, 3)
+    closes = closes.reshape(noOfBatches, batchSize, closes.shape[1], -1).swapaxes(2, 3)
+    # Teams that did not finish count as finishing at tEnd
+    endTimes = numpy.where(results.endTime[runs] == 0, tEnd, results.endTime[runs]).reshape(noOfBatches, batchSize, -1)
+    with warnings.catch_warnings(): # Activities no team reached in a batch give nan
+        warnings.simplefilter("ignore", RuntimeWarning)
+        batchValues = numpy.concatenate([
+            numpy.nanpercentile(starts.reshape(noOfBatches, -1, starts.shape[3]), 5, axis=1),
+            numpy.nanpercentile(closes.reshape(noOfBatches, -1, closes.shape[3]), 95, axis=1),
+            numpy.percentile(endTimes, [5, 95], axis=1).transpose(1, 0, 2).reshape(noOfBatches, -1)], axis=1)
+        stdev = numpy.nan_to_num(numpy.nanstd(batchValues, axis=0, ddof=1))
+    return tQuantile((1 + confidence) / 2, noOfBatches - 1) * stdev / numpy.sqrt(noOfBatches)
+
+def tQuantile(p, degreesOfFreedom):
+    """Quantile of Student's t distribution, p > 0.5. Up to 30 degrees of freedom it is found by
+    bisection on the exact distribution, above by a Cornish-Fisher expansion around the normal quantile,
+    which is then within 1e-4"""
+    if degreesOfFreedom <= 30:
+        low, high = 0.0, math.pi / 2 # Angle atan(t / sqrt(df)), with P(|T| < t) increasing in it
+        for _ in range(60):
+            angle = (low + high) / 2
+            if tCentralProbability(angle, degreesOfFreedom) < 2 * p - 1:
+                low = angle
+            else:
+                high = angle
+        return math.sqrt(degreesOfFreedom) * math.tan((low + high) / 2)
+    z = statistics.NormalDist().inv_cdf(p)
+    return (z + (z ** 3 + z) / (4 * degreesOfFreedom)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * degreesOfFreedom ** 2))
+
+# P(|T| < sqrt(df) * tan(angle)) for T with an integer no. of degrees of freedom df
+# (Abramowitz and Stegun 26.7.3 and 26.7.4)
+def tCentralProbability(angle, degreesOfFreedom):
+    c2 = math.cos(angle) ** 2
+    term = total = 1.0
+    for k in range(1 + degreesOfFreedom % 2, degreesOfFreedom - 1, 2): # Terms up to cos^(df-2)
+        term *= c2 * k / (k + 1)
+        total += term
+    if degreesOfFreedom % 2 == 0:
+        return math.sin(angle) * total
+    if degreesOfFreedom == 1:
+        return 2 * angle / math.pi
+    return 2 / math.pi * (angle + math.sin(angle) * math.cos(angle) * total)
+
+def runUntilConverged(Teams, Activities, tolerance, confidence=0.95, firstRuns=100, maxRuns=100000,
+                      seed=1, workers=1, engine="simpy", sampling="plain", profile=None, trace=None):
+    """Add runs until every percentile from percentileHalfWidths() is known within +-tolerance minutes.
+    The next number of runs is projected from the widest interval, which shrinks with sqrt(runs).
+    Returns the results and the widest half-width reached. At least 20 runs are made, one per batch
+    of percentileHalfWidths()"""
+    firstRuns = max(firstRuns, 20)
+    results = runBatch(Teams, Activities, runSeeds(seed, 0, firstRuns, sampling), workers, engine, profile, trace)
+    while True:
+        halfWidth = percentileHalfWidths(results, confidence).max()
+        if halfWidth <= tolerance or results.noOfRuns >= maxRuns:
+            return results, halfWidth
+        noOfRuns = int(results.noOfRuns * 1.1 * (halfWidth / tolerance) ** 2)
+        noOfRuns = min(max(noOfRuns, results.noOfRuns * 5 // 4), results.noOfRuns * 4, maxRuns)
+        print("%d runs: +-%.1f min, continuing to %d runs" % (results.noOfRuns, halfWidth, noOfRuns))
+        seeds = runSeeds(seed, results.noOfRuns, noOfRuns - results.noOfRuns, sampling)
+        results.extend(runBatch(Teams, Activities, seeds, workers, engine, profile, trace))
+
+def parameterGrid(axes):
+    """All combinations of parameter values, as a list of overrides for setupModel().
+    axes: {parameter: [values]}, e.g. {"capacity.Post 9": [4, 5, 6], "tStartInterval": [10, 15]}"""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+# Worker entry point for sweep(). Simulates one variant and summarises it
+def runVariant(args):
+    variant, overrides, noOfTeams, seeds, engine, checkpoint, report, courseName = args
+    Teams, Activities, course = setupModel(noOfTeams, dict(overrides or {}, **variant), courseName)
+    results = runSimulations(Teams, Activities, seeds, engine, checkpoint)
+    return summarizeVariant(variant, Activities, results, report)
+
+# Row of sweep() for the results of a variant
+def summarizeVariant(overrides, Activities, results, report=None):
+    if report is not None:
+        plotActivityStats(Activities, results, "", report)
+    # Teams that did not finish count as finishing at tEnd
+    finish = numpy.where(results.endTime == 0, tEnd, results.endTime)
+    return {"variant": overrides,
+            "totalWaits": numpy.nansum(results.waits, axis=(1, 2)), # Per run, for paired differences
+            "p95Finish": numpy.percentile(finish, 95),
+            "maxQueue": {a.name: results.maxQueues(a).mean() for a in Activities}}
+
+def sweep(variants, noOfRuns, noVTeams, noSTeams, noOBTeams, seed=1, workers=1, engine="numpy",
+          confidence=0.95, reportDirectory=None, reportFormat="png", courseName="default", sampling="plain",
+          queue=None, unitSize=100, overrides=None):
+    """Simulate every variant (overrides for setupModel()) and return one comparison row per variant.
+    All variants use the same seeds (common random numbers), so differences between them come
+    from the changes rather than from the draws. Rows hold the mean total wait per run, the p95 of
+    the time the last team finishes, the mean max queue per activity, and the paired difference in
+    total wait against the first variant with its confidence interval half-width.
+    p95Finish is the 95th percentile of team end times over all teams and runs.
+    reportDirectory: write the plots of variant no. i to variant-<i>-maxqueue.<reportFormat>
+    and variant-<i>-gantt.<reportFormat> in this directory, rendered by the worker processes
+    queue: shared directory to hand the runs to distributed workers in units of unitSize runs
+    instead of simulating them here, see runDistributed(). workers is not used then
+    overrides: other changes to the model, kept in every variant. Rows show the variant only"""
+    noOfTeams = {"V": noVTeams, "S": noSTeams, "OB": noOBTeams}
+    seeds = runSeeds(seed, 0, noOfRuns, sampling)
+    if reportDirectory is not None:
+        os.makedirs(reportDirectory, exist_ok=True)
+        reports = [os.path.join(reportDirectory, "variant-%03d.%s" % (i, reportFormat)) for i in range(len(variants))]
+    else:
+        reports = [None] * len(variants)
+    if queue is not None:
+        from .distributed import runDistributed # distributed imports this module
+        scenarios = [setupModel(noOfTeams, dict(overrides or {}, **variant), courseName)[:2] for variant in variants]
+        allResults = runDistributed(queue, scenarios, noOfRuns, seed, engine, sampling, unitSize,
+                                    progress=printProgress)
+        rows = [summarizeVariant(variant, Activities, results, report)
+                for variant, (Teams, Activities), results, report in zip(variants, scenarios, allResults, reports)]
+    elif workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            rows = pool.map(runVariant, [(variant, overrides, noOfTeams, seeds, engine, None, report, courseName)
+                                         for variant, report in zip(variants, reports)])
+    else: # Consecutive variants share a checkpoint and only re-simulate from the first changed station
+        checkpoint = Checkpoint() if engine == "numpy" else None
+        rows = [runVariant((variant, overrides, noOfTeams, seeds, engine, checkpoint, report, courseName))
+                for variant, report in zip(variants, reports)]
+    return compareRows(rows, noOfRuns, confidence)
+
+# Add the mean total wait and the paired difference in total wait against the first row to rows
+def compareRows(rows, noOfRuns, confidence=0.95):
+    for row in rows:
+        differences = row["totalWaits"] - rows[0]["totalWaits"]
+        row["totalWait"] = row["totalWaits"].mean()
+        row["waitDifference"] = differences.mean()
+        row["waitDifferenceCI"] = (tQuantile((1 + confidence) / 2, max(noOfRuns - 1, 1))
+                                   * differences.std(ddof=1) / numpy.sqrt(noOfRuns) if noOfRuns > 1 else 0)
+    return rows
+
+def compareRouting(noOfRuns, noVTeams, noSTeams, noOBTeams, seed=1, workers=1, confidence=0.95, overrides=None,
+                   courseName="default", sampling="plain"):
+    """Simulate the course with the choices taken in the order given (heap engine) and chosen by the
+    queues (dynamic engine) on the same seeds, and return two rows as sweep() does, with variant
+    {"routing": "fixed"} and {"routing": "dynamic"}. The wait difference of the second row is the
+    total wait per run saved by redirecting teams. overrides and courseName as for simulate()"""
+    noOfTeams = {"V": noVTeams, "S": noSTeams, "OB": noOBTeams}
+    seeds = runSeeds(seed, 0, noOfRuns, sampling)
+    args = [({}, overrides, noOfTeams, seeds, engine, None, None, courseName) for engine in ("heap", "dynamic")]
+    if workers > 1:
+        with multiprocessing.Pool(2) as pool:
+            rows = pool.map(runVariant, args)
+    else:
+        rows = [runVariant(variantArgs) for variantArgs in args]
+    for row, routing in zip(rows, ("fixed", "dynamic")):
+        row["variant"] = {"routing": routing}
+    return compareRows(rows, noOfRuns, confidence)
+
+def estimate(noVTeams, noSTeams, noOBTeams, overrides=None, courseName="default"):
+    """Print and return the analytic estimate of the queues (see analyticEstimate()), without simulating.
+    overrides and courseName as for simulate()"""
+    Teams, Activities, course = setupModel({"V": noVTeams, "S": noSTeams, "OB": noOBTeams}, overrides, courseName)
+    estimates = analyticEstimate(Teams, Activities)
+    printEstimate(estimates)
+    return estimates
+
+def forecastRace(checkInsPath, noOfRuns, noVTeams, noSTeams, noOBTeams, seed=1, overrides=None,
+                 courseName="default", now=None, follow=False, interval=1.0):
+    """Print and return a forecast of the rest of the race from the check-ins in checkInsPath (see
+    readCheckIns()), from time now (default: the latest check-in). With follow, the file is read again
+    every interval seconds and a new forecast printed whenever it has changed, until interrupted.
+    overrides and courseName as for simulate()"""
+    Teams, Activities, course = setupModel({"V": noVTeams, "S": noSTeams, "OB": noOBTeams}, overrides, courseName)
+    modified = None
+    forecast = None
+    while True:
+        if os.path.getmtime(checkInsPath) != modified:
+            modified = os.path.getmtime(checkInsPath)
+            forecaster = Forecaster(Teams, Activities)
+            forecaster.observe(readCheckIns(checkInsPath))
+            forecast = forecaster.forecast(noOfRuns, seed, now)
+            printForecast(forecast)
+        if not follow:
+            return forecast
+        try:
+            time.sleep(interval)
+        except KeyboardInterrupt:
+            return forecast
+
+def simulate(noOfRuns, noVTeams, noSTeams, noOBTeams, workers=1, seed=1, engine="simpy",
+             online=False, batchSize=1000, tolerance=None, confidence=0.95, maxRuns=100000,
+             cache=None, overrides=None, checkpoint=None, output=None, plot=True, courseName="default",
+             sampling="plain", profile=None, trace=None, store=None, queue=None):
+    """
+    queue: shared directory to hand the runs to distributed workers in units of batchSize runs
+           instead of simulating them here, see runDistributed(). Started again with the same
+           scenario, it resumes after the units already done
+    store: ResultStore to append the runs to in chunks of batchSize runs, resuming after the runs it
+           already holds. The report is made from all runs in the store
+    trace: file to write every enqueue, service start and departure of every run to, see TraceWriter.
+           Needs workers=1 and cannot be combined with cache, which skips runs
+    profile: Profile to record the time of each phase, the runs and the memory in. It is printed at the end
+    sampling: "plain", "antithetic" or "lhs" (Latin hypercube speeds), see runSeeds()
+    courseName: built-in course or course file, see loadCourse()
+    plot: False to print the report only, without importing matplotlib
+    output: write the plots to files instead of showing them, see plotActivityStats()
+    overrides: changes to the model, see setupModel()
+    checkpoint: Checkpoint shared between calls with the numpy engine. After changing an activity
+                in overrides, only the stations from the first changed one are simulated again
+    cache: ResultCache to reuse and extend the runs of earlier invocations of the same scenario
+    online: keep only streaming summaries (OnlineResults), simulating batchSize runs at a time
+    tolerance: start with noOfRuns and add runs until the reported open/close and end time
+               percentiles are known within +-tolerance minutes at the given confidence
+    engine: "simpy", "heap" (plain event queue, same statistics, much faster),
+            "dynamic" (heap engine choosing the way at the choices of the course by the queues)
+            or "numpy" (all runs at once as arrays, fastest for many runs)
+    """
+    with phase(profile, "setup"):
+        Teams, Activities, course = setupModel({"V": noVTeams, "S": noSTeams, "OB": noOBTeams}, overrides, courseName)
+
+        for text in printCourses(Teams, course):
+            print(text)
+        for e in analyticEstimate(Teams, Activities):
+            if e["saturated"]:
+                print("Warning: %s is saturated: %.0f%% utilization at the busiest time, estimated mean wait %.1f min"
+                      % (e["activity"].name, e["utilization"] * 100, e["wait"]))
+
+    with phase(profile, "run"):
+        if trace is not None:
+            if cache is not None:
+                raise ValueError("trace cannot be used with cache, which does not simulate cached runs")
+            if workers > 1:
+                raise ValueError("trace can only be used with workers=1")
+            with TraceWriter(trace, Activities, len(Teams)) as traceWriter:
+                results = runScenario(Teams, Activities, noOfRuns, workers, seed, engine, online, batchSize,
+                                      tolerance, confidence, maxRuns, cache, checkpoint, sampling, profile,
+                                      traceWriter, store, queue)
+            print("Wrote %s" % trace)
+        else:
+            results = runScenario(Teams, Activities, noOfRuns, workers, seed, engine, online, batchSize, tolerance,
+                                  confidence, maxRuns, cache, checkpoint, sampling, profile, store=store,
+                                  queue=queue)
+
+    with phase(profile, "summarize"):
+        printSummary(Teams, Activities, results)
+
+    if plot:
+        with phase(profile, "plot"):
+            title = "\n".join(printCourses(Teams, course))
+            startTime = min((t.startTime for t in Teams), default=None)
+            for path in plotActivityStats(Activities, results, title, output, startTime):
+                print("Wrote %s" % path)
+    if profile is not None:
+        printProfile(profile)
+    return results
+
+# The runs of simulate(), with the options of simulate()
+def runScenario(Teams, Activities, noOfRuns, workers, seed, engine, online, batchSize, tolerance, confidence,
+                maxRuns, cache, checkpoint, sampling, profile, trace=None, store=None, queue=None):
+    if queue is not None and (tolerance is not None or online or checkpoint is not None or cache is not None
+                              or store is not None or trace is not None):
+        raise ValueError("queue cannot be combined with tolerance, online, checkpoint, cache, store or trace")
+    if store is not None and (tolerance is not None or online or checkpoint is not None or cache is not None):
+        raise ValueError("store cannot be combined with tolerance, online, checkpoint or cache")
+    if tolerance is not None:
+        if online:
+            raise ValueError("tolerance needs the results of every run and cannot be used with online")
+        print("Running simulations until percentiles are within +-%.1f min" % tolerance)
+        results, halfWidth = runUntilConverged(Teams, Activities, tolerance, confidence, noOfRuns, maxRuns,
+                                               seed, workers, engine, sampling, profile, trace)
+        print("%s after %d runs: percentiles within +-%.1f min at %d%% confidence"
+              % ("Converged" if halfWidth <= tolerance else "Not converged", results.noOfRuns,
+                 halfWidth, confidence * 100))
+    elif online:
+        print("Running %d simulations" % noOfRuns)
+        results = OnlineResults(len(Teams), len(Activities), scenarioTeamTypes(Teams))
+        for firstRun in range(0, noOfRuns, batchSize):
+            seeds = runSeeds(seed, firstRun, min(batchSize, noOfRuns - firstRun), sampling)
+            results.update(runBatch(Teams, Activities, seeds, workers, engine, profile, trace))
+    elif checkpoint is not None:
+        if engine != "numpy":
+            raise ValueError("checkpoint can only be used with the numpy engine")
+        print("Running %d simulations" % noOfRuns)
+        results = runSimulations(Teams, Activities, runSeeds(seed, 0, noOfRuns, sampling), engine, checkpoint,
+                                 profile, trace)
+    elif cache is not None:
+        print("Running %d simulations (cached in %s)" % (noOfRuns, cache.directory))
+        results = runCached(cache, Teams, Activities, noOfRuns, seed, workers, engine, sampling, profile)
+    elif store is not None:
+        storedRuns = store.begin(scenarioFingerprint(Teams, Activities, seed, engine, sampling), len(Teams),
+                                 len(Activities), scenarioTeamTypes(Teams))
+        if storedRuns:
+            print("Resuming after %d runs stored in %s" % (storedRuns, store.directory))
+        print("Running %d simulations (stored in %s)" % (max(noOfRuns - storedRuns, 0), store.directory))
+        for firstRun in range(storedRuns, noOfRuns, batchSize):
+            seeds = runSeeds(seed, firstRun, min(batchSize, noOfRuns - firstRun), sampling)
+            store.append(runBatch(Teams, Activities, seeds, workers, engine, profile, trace))
+        results = store.results()
+    elif queue is not None:
+        from .distributed import runDistributed # distributed imports this module
+        print("Running %d simulations on the workers of %s" % (noOfRuns, queue))
+        results = runDistributed(queue, [(Teams, Activities)], noOfRuns, seed, engine, sampling, batchSize,
+                                 progress=printProgress)[0]
+    else:
+        print("Running %d simulations" % noOfRuns)
+        results = runBatch(Teams, Activities, runSeeds(seed, 0, noOfRuns, sampling), workers, engine, profile, trace)
+    return results
+
+# Progress of runDistributed()
+def printProgress(done, total):
+    print("%d of %d units done" % (done, total), flush=True)
+
+# Print opening and closing times and occupancy of the activities and the end times and waits of the teams
+def printSummary(Teams, Activities, results):
+    print("Activities: Start/Close")
+    for act in Activities:
+        # print("%s: Total wait=%s, avg. wait=%s, Max queue=%s, StartV=%s, EndV=%s, StartS=%s, EndS=%s, StartOB=%s, EndOB=%s, Start/Close=%s"
+        #       % (act.name, minMaxAvgSumPerRun(results.activityWaits(act)),
+        #          minMaxAvgAvgPerRun(results.activityWaits(act)), minMaxAvg(results.maxQueues(act)),
+        #          minMaxAvgTime(results.firstTeamStarts(act, "V")),
+        #          minMaxAvgTime(results.lastTeamEnds(act, "V")),
+        #          minMaxAvgTime(results.firstTeamStarts(act, "S")),
+        #          minMaxAvgTime(results.lastTeamEnds(act, "S")),
+        #          minMaxAvgTime(results.firstTeamStarts(act, "OB")),
+        #          minMaxAvgTime(results.lastTeamEnds(act, "OB")),
+        #          startCloseTime(results, act)))
+        startCloseTimes = startCloseTime(results, act)
+        print("%9s: %s, %s"
+              % (act.name,
+                 startCloseTimes[0],
+                 startCloseTimes[1]))
+    printUtilization(Activities, results)
+    
+    for t in Teams:
+        print("%s: Start=%s, End=%s, Total wait=%s, avg. wait/run=%s"
+              % (t.name, formatTime(t.startTime), formatMinMaxAvgTime(results.endTimeSummary(t)),
+              formatMinMaxAvgTime(results.waitSumSummary(t)), formatMinMaxAvgTime(results.waitAvgSummary(t))))
+
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Random inputs of the runs. All engines draw the speeds and durations of a run up front from
+the seed of the run, so a run gives the same inputs whatever the engine or the model changes"""
+
+import statistics
+import numpy
+
+# Sampling schemes for runSeeds()
+samplingSchemes = ["plain", "antithetic", "lhs"]
+
+def runSeeds(seed, firstRun, noOfRuns, sampling="plain", blockSize=100):
+    """Derive the seed of each run from the base seed.
+    Run i always gets the same seed, whatever the number of runs or workers.
+    sampling: "plain" gives independent runs, with an int seed for each run.
+    "antithetic" pairs run 2k+1 with run 2k: it uses the same seed with mirrored draws (1 - u, -z).
+    "lhs" stratifies the speed of each team over blocks of blockSize runs (Latin hypercube).
+    These give (seed, mirrored, blockSeed, position in block, blockSize) instead of an int"""
+    if sampling not in samplingSchemes:
+        raise ValueError("Unknown sampling: %s" % sampling)
+    seeds = []
+    for i in range(firstRun, firstRun + noOfRuns):
+        if sampling == "antithetic":
+            pairSeed = int(numpy.random.SeedSequence(seed, spawn_key=(i - i % 2,)).generate_state(1, numpy.uint64)[0])
+            seeds.append((pairSeed, i % 2 == 1, None, 0, 1))
+            continue
+        runSeed = int(numpy.random.SeedSequence(seed, spawn_key=(i,)).generate_state(1, numpy.uint64)[0])
+        if sampling == "lhs":
+            blockSeed = int(numpy.random.SeedSequence(seed, spawn_key=(i // blockSize, 1))
+                            .generate_state(1, numpy.uint64)[0])
+            seeds.append((runSeed, False, blockSeed, i % blockSize, blockSize))
+        else:
+            seeds.append(runSeed)
+    return seeds
+
+# Inverse of the standard normal distribution function, elementwise
+inverseNormal = numpy.vectorize(statistics.NormalDist().inv_cdf, otypes=[float])
+
+def drawRandomInputs(seeds, noOfTeams, noOfActivities):
+    """Random inputs of the runs with the given seeds (see runSeeds()), by team and activity index:
+    standard normal speed draws (runs x teams) and uniform duration draws (runs x teams x activities).
+    Speeds and durations come from separate substreams of the seed of a run, so a draw does not
+    depend on the order of events or on the other draws"""
+    normals = numpy.empty((len(seeds), noOfTeams))
+    uniforms = numpy.empty((len(seeds), noOfTeams, noOfActivities))
+    strata = {} # Stratum of each team in each position of a Latin hypercube block, by block seed
+    for k, runSeed in enumerate(seeds):
+        if isinstance(runSeed, tuple):
+            runSeed, mirrored, blockSeed, position, blockSize = runSeed
+        else:
+            mirrored, blockSeed = False, None
+        speedSeed, durationSeed = numpy.random.SeedSequence(runSeed).spawn(2)
+        speedStream = numpy.random.default_rng(speedSeed)
+        if blockSeed is None:
+            normals[k] = speedStream.standard_normal(noOfTeams)
+        else:
+            if blockSeed not in strata:
+                strata[blockSeed] = numpy.random.default_rng(blockSeed).permuted(
+                    numpy.tile(numpy.arange(blockSize), (noOfTeams, 1)), axis=1)
+            u = (strata[blockSeed][:, position] + speedStream.random(noOfTeams)) / blockSize
+            normals[k] = inverseNormal(numpy.clip(u, 1e-12, 1 - 1e-12)) # inv_cdf(0) is undefined
+        uniforms[k] = numpy.random.default_rng(durationSeed).random((noOfTeams, noOfActivities))
+        if mirrored:
+            normals[k] = -normals[k]
+            uniforms[k] = 1 - uniforms[k]
+    return normals, uniforms
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""Simulation service: python -m flowsimulation.service --help
+
+A long-running asyncio server for front-ends that ask many questions in a row. It keeps the
+imports, the scenarios built by setupModel() and a pool of worker processes warm, and answers
+requests of one JSON object per line on a TCP connection with lines of JSON:
+
+    {"id": 1, "type": "simulate", "runs": 1000, "teams": {"V": 27, "S": 14, "OB": 20},
+     "overrides": {"capacity.Post 9": 6}, "course": "default", "seed": 1, "engine": "numpy"}
+    {"id": 2, "type": "sweep", "variants": [{}, {"capacity.Post 9": 6}], "runs": 1000}
+    {"id": 3, "type": "status"}
+
+Fields left out take the values of defaultRequest. A simulate request is answered with a partial
+line each time a batch of runs is done, holding the summary of the runs so far (see RunningSummary),
+and a result line with the summary of all runs. A sweep is answered with the partial lines of its
+variants, tagged with the variant no., and a result line with the rows of sweep(). Errors are
+answered with an error line. Each line carries the id of its request, and a connection may have
+several requests in flight.
+
+Identical requests in flight share one computation, and the summaries of recent ones are kept, so
+asking again is answered at once. The first batch of a computation is small, and a computation
+keeps at most one batch per worker waiting, so a quick question is not queued behind all batches
+of a long one"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import pickle
+import time
+import numpy
+from .model import tEnd, setupModel
+from .sampling import runSeeds, samplingSchemes
+from .results import scenarioFingerprint
+from .engines import engines
+from .runner import runSimulations, compareRows
+
+# Fields of a request and their values if left out
+defaultRequest = {"id": None, "type": "simulate", "runs": 1000, "teams": {"V": 27, "S": 14, "OB": 20},
+                  "overrides": {}, "course": "default", "seed": 1, "engine": "numpy", "sampling": "plain",
+                  "variants": [{}], "confidence": 0.95}
+
+# Scenarios unpickled by a worker process, by key, most recently used last
+workerScenarios = collections.OrderedDict()
+
+def runScenarioBatch(key, scenario, seeds, engine):
+    """Worker entry point: simulate seeds on scenario, (Teams, Activities) pickled once by the
+    computation. Each worker unpickles a scenario once and keeps the last few for the next batches"""
+    if key not in workerScenarios:
+        workerScenarios[key] = pickle.loads(scenario)
+        while len(workerScenarios) > 16:
+            workerScenarios.popitem(last=False)
+    workerScenarios.move_to_end(key)
+    Teams, Activities = workerScenarios[key]
+    return runSimulations(Teams, Activities, seeds, engine)
+
+# Add values (minutes) to a histogram of one-minute bins from 0 to tEnd, one row per entry of rows
+def addToHistogram(counts, values, rows=0):
+    bins = numpy.minimum(values, tEnd).astype(int)
+    counts += numpy.bincount((rows * counts.shape[-1] + bins).ravel(), minlength=counts.size).reshape(counts.shape)
+
+# Percentile of the values counted in a histogram of one-minute bins from 0, interpolated within the
+# minute. top: value of the values in the last bin, such as tEnd for addToHistogram(). 0 if it is empty
+def histogramPercentile(counts, percentile, top=None):
+    cumulative = numpy.cumsum(counts)
+    if not len(counts) or not cumulative[-1]:
+        return 0.0
+    target = percentile / 100 * cumulative[-1]
+    k = int(numpy.searchsorted(cumulative, target))
+    if top is not None and k == len(counts) - 1:
+        return float(top)
+    return k + (target - (cumulative[k] - counts[k])) / counts[k]
+
+class RunningSummary(object):
+    """Summary of the runs folded in so far by update(), for a reply, in minutes: mean and p95 of the
+    total wait per run, p50 and p95 of the team finish times (teams that did not finish count as
+    finishing at tEnd), and per activity the p5 opening and p95 closing time, the mean wait per
+    visit and the mean max queue. The times and total waits are counted in histograms of one minute,
+    so memory only grows with the total wait of each run, which a sweep needs for its paired
+    differences"""
+
+    def __init__(self, noOfRuns, Activities):
+        self.Activities = Activities
+        self.noOfRuns = 0
+        self.totalWaits = numpy.zeros(noOfRuns) # By run no.
+        self.totalWaitSum = 0.0
+        self.totalWaitCounts = numpy.zeros(0, dtype=int) # Grows to the longest total wait
+        self.finishes = numpy.zeros(int(tEnd) + 1, dtype=int)
+        self.opens = numpy.zeros((len(Activities), int(tEnd) + 1), dtype=int)
+        self.closes = numpy.zeros_like(self.opens)
+        self.waitSums = numpy.zeros(len(Activities))
+        self.visits = numpy.zeros(len(Activities), dtype=int)
+        self.maxQueueSums = numpy.zeros(len(Activities))
+
+    # Fold in the SimulationResults of runs firstRun onwards
+    def update(self, firstRun, results):
+        totalWaits = numpy.nansum(results.waits, axis=(1, 2))
+        self.totalWaits[firstRun:firstRun + results.noOfRuns] = totalWaits
+        self.totalWaitSum += totalWaits.sum()
+        counts = numpy.bincount(totalWaits.astype(int))
+        if len(counts) > len(self.totalWaitCounts):
+            self.totalWaitCounts = numpy.pad(self.totalWaitCounts, (0, len(counts) - len(self.totalWaitCounts)))
+        self.totalWaitCounts[:len(counts)] += counts
+        addToHistogram(self.finishes, numpy.where(results.endTime == 0, tEnd, results.endTime))
+        activities = numpy.arange(len(self.Activities))[:, None]
+        for counts, times in ((self.opens, results.firstTeamStart), (self.closes, results.lastTeamEnd)):
+            times = times.transpose(1, 0, 2).reshape(len(self.Activities), -1) # Activity x (runs and types)
+            arrived = times != 0 # Team types that did not arrive are left out
+            addToHistogram(counts, times[arrived], numpy.broadcast_to(activities, times.shape)[arrived])
+        self.waitSums += numpy.nansum(results.waits, axis=(0, 1))
+        self.visits += numpy.count_nonzero(~numpy.isnan(results.waits), axis=(0, 1))
+        self.maxQueueSums += results.maxQueue.sum(axis=0)
+        self.noOfRuns += results.noOfRuns
+
+    def summary(self):
+        activities = []
+        for a in self.Activities:
+            activities.append({"name": a.name, "open5": histogramPercentile(self.opens[a.index], 5, tEnd),
+                               "close95": histogramPercentile(self.closes[a.index], 95, tEnd),
+                               "wait": float(self.waitSums[a.index] / max(self.visits[a.index], 1)),
+                               "maxQueue": float(self.maxQueueSums[a.index] / self.noOfRuns)})
+        return {"runs": self.noOfRuns, "totalWait": self.totalWaitSum / self.noOfRuns,
+                "totalWait95": histogramPercentile(self.totalWaitCounts, 95),
+                "finish50": histogramPercentile(self.finishes, 50, tEnd),
+                "finish95": histogramPercentile(self.finishes, 95, tEnd),
+                "activities": activities}
+
+class Computation(object):
+    """The runs of one scenario, simulated batch by batch in the worker pool by run(). Subscribers
+    get the partial summaries and the final one through their asyncio queues. Each batch is folded
+    into a RunningSummary, and when done, only the summary and the total wait per run are kept"""
+
+    def __init__(self, key, Teams, Activities, noOfRuns, seed, engine, sampling):
+        self.key, self.scenario = key, pickle.dumps((Teams, Activities))
+        self.noOfRuns, self.seed, self.engine, self.sampling = noOfRuns, seed, engine, sampling
+        self.running = RunningSummary(noOfRuns, Activities)
+        self.subscribers = []
+        self.summary = None # Of the runs done so far
+        self.totalWaits = None # Per run, when done
+        self.error = None
+        self.finished = asyncio.get_running_loop().create_future()
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        if self.summary is not None:
+            queue.put_nowait(("partial", self.summary))
+        self.subscribers.append(queue)
+        return queue
+
+    def publish(self, message):
+        for queue in self.subscribers:
+            queue.put_nowait(message)
+
+    async def run(self, pool, maxInFlight, firstBatch, batchSize):
+        loop = asyncio.get_running_loop()
+        batches = [(0, min(firstBatch, self.noOfRuns))]
+        batches += [(firstRun, min(batchSize, self.noOfRuns - firstRun))
+                    for firstRun in range(batches[0][1], self.noOfRuns, batchSize)]
+        firstRuns = {}
+        try:
+            while batches or firstRuns:
+                while batches and len(firstRuns) < maxInFlight:
+                    firstRun, noOfRuns = batches.pop(0)
+                    seeds = runSeeds(self.seed, firstRun, noOfRuns, self.sampling)
+                    firstRuns[loop.run_in_executor(pool, runScenarioBatch, self.key, self.scenario, seeds,
+                                                   self.engine)] = firstRun
+                done = (await asyncio.wait(firstRuns, return_when=asyncio.FIRST_COMPLETED))[0]
+                for future in done:
+                    self.running.update(firstRuns.pop(future), future.result())
+                self.summary = self.running.summary()
+                if batches or firstRuns:
+                    self.publish(("partial", self.summary))
+            self.totalWaits = self.running.totalWaits
+            self.publish(("result", self.summary))
+        except Exception as e: # Also raised in the worker, e.g. a course the engine cannot run
+            for future in firstRuns:
+                future.cancel()
+            self.error = "%s: %s" % (type(e).__name__, e)
+            self.publish(("error", self.error))
+        finally:
+            self.running = self.scenario = None
+            self.finished.set_result(None)
+
+class Service(object):
+    """State of the server: the worker pool, the scenarios built so far and the computations in
+    flight and recently done, each bounded by least recent use"""
+
+    def __init__(self, workers=1, firstBatch=100, batchSize=250, noOfScenarios=128, noOfComputations=256,
+                 maxRuns=1000000):
+        self.workers, self.firstBatch, self.batchSize, self.maxRuns = workers, firstBatch, batchSize, maxRuns
+        self.pool = concurrent.futures.ProcessPoolExecutor(workers)
+        list(self.pool.map(int, range(workers))) # Start the workers now rather than on the first request
+        self.scenarios = collections.OrderedDict() # Key of teams, overrides and course -> (Teams, Activities)
+        self.computations = collections.OrderedDict() # Key of scenario and runs -> Computation
+        self.noOfScenarios, self.noOfComputations = noOfScenarios, noOfComputations
+        self.tasks = set()
+
+    def scenario(self, noOfTeams, overrides, courseName):
+        key = json.dumps([noOfTeams, overrides, courseName], sort_keys=True)
+        if key not in self.scenarios:
+            Teams, Activities, course = setupModel(noOfTeams, overrides, courseName)
+            self.scenarios[key] = (Teams, Activities)
+            while len(self.scenarios) > self.noOfScenarios:
+                self.scenarios.popitem(last=False)
+        self.scenarios.move_to_end(key)
+        return self.scenarios[key]
+
+    def computation(self, request, overrides):
+        """The computation of the request with these overrides: the one in flight or done recently,
+        or a new one. Returns (computation, whether it was done already)"""
+        Teams, Activities = self.scenario(request["teams"], overrides, request["course"])
+        key = (scenarioFingerprint(Teams, Activities, request["seed"], request["engine"], request["sampling"]),
+               request["runs"])
+        computation = self.computations.get(key)
+        if computation is not None and computation.error is None:
+            self.computations.move_to_end(key)
+            return computation, computation.finished.done()
+        computation = Computation(key[0], Teams, Activities, request["runs"], request["seed"], request["engine"],
+                                  request["sampling"])
+        self.computations[key] = computation
+        task = asyncio.get_running_loop().create_task(
+            computation.run(self.pool, self.workers, self.firstBatch, self.batchSize))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        finished = [k for k, c in self.computations.items() if c.finished.done()]
+        for k in finished[:max(len(self.computations) - self.noOfComputations, 0)]:
+            del self.computations[k]
+        return computation, False
+
+    def parse(self, request):
+        """Request with the defaults filled in. Raises ValueError naming the first problem"""
+        unknown = set(request) - set(defaultRequest)
+        if unknown:
+            raise ValueError("unknown fields: %s" % ", ".join(sorted(unknown)))
+        request = dict(defaultRequest, **request)
+        if request["type"] not in ("simulate", "sweep", "status"):
+            raise ValueError("type must be simulate, sweep or status")
+        runs = request["runs"]
+        if isinstance(runs, bool) or not isinstance(runs, int) or not 2 <= runs <= self.maxRuns:
+            raise ValueError("runs must be an integer from 2 to %d" % self.maxRuns)
+        if not isinstance(request["teams"], dict) or not all(
+                isinstance(n, int) and not isinstance(n, bool) and n >= 0 for n in request["teams"].values()):
+            raise ValueError("teams must map team types to numbers of teams")
+        if not isinstance(request["overrides"], dict):
+            raise ValueError("overrides must map parameters to values, see setupModel()")
+        if not isinstance(request["variants"], list) or not request["variants"] or not all(
+                isinstance(variant, dict) for variant in request["variants"]):
+            raise ValueError("variants must be a non-empty list of overrides")
+        if request["engine"] not in list(engines) + ["numpy"]:
+            raise ValueError("unknown engine: %s" % request["engine"])
+        if request["sampling"] not in samplingSchemes:
+            raise ValueError("unknown sampling: %s" % request["sampling"])
+        return request
+
+    async def simulate(self, request, send):
+        computation, cached = self.computation(request, request["overrides"])
+        if cached:
+            await send({"type": "result", "summary": computation.summary, "cached": True})
+            return
+        queue = computation.subscribe()
+        try:
+            while True:
+                kind, content = await queue.get()
+                if kind == "error":
+                    raise RuntimeError(content)
+                await send({"type": kind, "summary": content, "cached": False} if kind == "result"
+                           else {"type": kind, "summary": content})
+                if kind == "result":
+                    return
+        finally:
+            computation.subscribers.remove(queue)
+
+    async def sweep(self, request, send):
+        variants = request["variants"]
+        computations = [self.computation(request, dict(request["overrides"], **variant))[0] for variant in variants]
+        queues = [computation.subscribe() for computation in computations]
+        try:
+            async def forward(i):
+                while True:
+                    kind, content = await queues[i].get()
+                    if kind == "error":
+                        raise RuntimeError(content)
+                    if kind == "partial":
+                        await send({"type": "partial", "variant": i, "summary": content})
+                    else:
+                        return
+            # Computations done before subscribing have no result message to wait for
+            await asyncio.gather(*(forward(i) for i in range(len(variants))
+                                   if not computations[i].finished.done()))
+        finally:
+            for computation, queue in zip(computations, queues):
+                computation.subscribers.remove(queue)
+        for computation in computations:
+            if computation.error is not None:
+                raise RuntimeError(computation.error)
+        rows = [{"variant": variant, "totalWaits": computation.totalWaits,
+                 "p95Finish": computation.summary["finish95"],
+                 "maxQueue": {a["name"]: a["maxQueue"] for a in computation.summary["activities"]}}
+                for variant, computation in zip(variants, computations)]
+        rows = compareRows(rows, request["runs"], request["confidence"])
+        await send({"type": "result", "rows": [{name: float(value) if isinstance(value, numpy.floating) else value
+                                                for name, value in row.items() if name != "totalWaits"}
+                                               for row in rows]})
+
+    def status(self):
+        return {"type": "status", "workers": self.workers, "scenarios": len(self.scenarios),
+                "inFlight": sum(not c.finished.done() for c in self.computations.values()),
+                "cached": sum(c.finished.done() for c in self.computations.values())}
+
+    async def handle(self, line, send):
+        """Answer one request line through send(message), which adds the id of the request"""
+        requestId = None
+        startTime = time.perf_counter()
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+            requestId = request.get("id")
+            request = self.parse(request)
+            if request["type"] == "status":
+                await send(self.status(), requestId)
+            else:
+                async def sendReply(message):
+                    message["seconds"] = round(time.perf_counter() - startTime, 3)
+                    await send(message, requestId)
+                await (self.simulate if request["type"] == "simulate" else self.sweep)(request, sendReply)
+        except ConnectionError:
+            raise
+        except Exception as e: # Bad requests and failed computations. The service goes on
+            await send({"type": "error", "message": "%s: %s" % (type(e).__name__, e)}, requestId)
+
+    async def connection(self, reader, writer):
+        lock = asyncio.Lock()
+        async def send(message, requestId):
+            async with lock:
+                writer.write((json.dumps(dict(message, id=requestId)) + "\n").encode("utf-8"))
+                await writer.drain()
+        requests = set()
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.get_running_loop().create_task(self.handle(line, send))
+                    requests.add(task)
+                    task.add_done_callback(requests.discard)
+            await asyncio.gather(*requests)
+        except ConnectionError: # The client left. Its computations go on for others and the cache
+            for task in requests:
+                task.cancel()
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.connection, host, port, limit=2 ** 20)
+        print("Serving on %s" % ", ".join("%s:%d" % s.getsockname()[:2] for s in server.sockets), flush=True)
+        async with server:
+            await server.serve_forever()
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m flowsimulation.service",
+                                     description="Answer simulate and sweep requests as JSON lines over TCP")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="worker processes (default: all cores)")
+    parser.add_argument("--first-batch", type=int, default=100,
+                        help="runs in the first batch of a computation, for a quick first answer (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=250, help="runs per later batch (default: %(default)s)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parseArguments(argv)
+    service = Service(args.workers, args.first_batch, args.batch_size)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.pool.shutdown(cancel_futures=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Queue traces: every arrival (enqueue), service start and departure of every run as fixed-width
+binary records, and a reader that analyses them through a memory map.
+
+A trace file is a header followed by records of traceDtype (13 bytes each, so a million runs of the
+default course take about 5 GB). The header holds the magic bytes, the length of the JSON metadata
+(activity names and capacities, no. of teams and runs, tEnd) and the metadata itself"""
+
+import json
+import struct
+import numpy
+from .model import tEnd
+
+traceDtype = numpy.dtype([("run", "<u4"), ("time", "<f4"), ("station", "<u2"), ("team", "<u2"), ("event", "u1")])
+
+# Event codes of the records
+enqueueEvent, startEvent, departEvent = 0, 1, 2
+
+magic = b"FLOWTRC1"
+
+class TraceWriter(object):
+    """Write queue events to a trace file through a fixed-size record buffer.
+    The engines call enqueue(), start() and depart() with the current run in self.run, or
+    records() for a batch of events at once (numpy engine). Close the writer (or use it in a
+    with statement) to flush the buffer and store the number of runs in the header"""
+
+    def __init__(self, path, Activities, noOfTeams, bufferSize=1 << 16):
+        self.path = path
+        self.metadata = {"activities": [a.name for a in Activities], "capacities": [a.capacity for a in Activities],
+                         "noOfTeams": noOfTeams, "noOfRuns": 0, "tEnd": tEnd}
+        self.headerSize = len(json.dumps(self.metadata)) + 32 # Room for the final no. of runs
+        self.file = open(path, "wb")
+        self.writeHeader()
+        self.buffer = numpy.empty(bufferSize, dtype=traceDtype)
+        self.used = 0
+        self.run = 0 # Run of the events from enqueue(), start() and depart()
+        self.noOfRuns = 0 # Runs written, the next batch of runs starts at this run no.
+
+    def writeHeader(self):
+        header = json.dumps(self.metadata).encode("utf-8").ljust(self.headerSize)
+        self.file.seek(0)
+        self.file.write(magic + struct.pack("<Q", self.headerSize) + header)
+
+    def enqueue(self, time, station, team):
+        self.record(time, station, team, enqueueEvent)
+
+    def start(self, time, station, team):
+        self.record(time, station, team, startEvent)
+
+    def depart(self, time, station, team):
+        self.record(time, station, team, departEvent)
+
+    def record(self, time, station, team, event):
+        if self.used == len(self.buffer):
+            self.flush()
+        self.buffer[self.used] = (self.run, time, station, team, event)
+        self.used += 1
+
+    # Write the events of arrays of runs, times and teams (broadcast together) at a station
+    def records(self, runs, times, station, teams, event):
+        runs, times, teams = numpy.broadcast_arrays(runs, times, teams)
+        block = numpy.empty(times.size, dtype=traceDtype)
+        block["run"], block["time"], block["team"] = runs.ravel(), times.ravel(), teams.ravel()
+        block["station"], block["event"] = station, event
+        self.flush()
+        self.file.write(block.tobytes())
+
+    def flush(self):
+        self.file.write(self.buffer[:self.used].tobytes())
+        self.used = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.metadata["noOfRuns"] = self.noOfRuns
+        self.writeHeader()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Trace(object):
+    """Read a trace file through a memory map. records is a numpy.memmap of traceDtype, so only
+    the parts in use are loaded. The analyses go through the records in chunks of chunkSize"""
+
+    def __init__(self, path, chunkSize=1 << 22):
+        with open(path, "rb") as f:
+            if f.read(len(magic)) != magic:
+                raise ValueError("Not a trace file: %s" % path)
+            headerSize, = struct.unpack("<Q", f.read(8))
+            self.metadata = json.loads(f.read(headerSize).decode("utf-8"))
+        offset = len(magic) + 8 + headerSize
+        noOfRecords = (numpy.memmap(path, dtype="u1", mode="r").size - offset) // traceDtype.itemsize
+        self.records = numpy.memmap(path, dtype=traceDtype, mode="r", offset=offset, shape=(noOfRecords,))
+        self.activityNames = self.metadata["activities"]
+        self.noOfRuns = self.metadata["noOfRuns"]
+        self.tEnd = self.metadata["tEnd"]
+        self.chunkSize = chunkSize
+
+    def stationIndex(self, station):
+        return self.activityNames.index(station) if isinstance(station, str) else station
+
+    def chunks(self):
+        for first in range(0, len(self.records), self.chunkSize):
+            yield self.records[first:first + self.chunkSize]
+
+    # Records of a station (name or index), and of a single run if run is not None, loaded into memory
+    def select(self, station, run=None):
+        station = self.stationIndex(station)
+        selected = []
+        for chunk in self.chunks():
+            mask = chunk["station"] == station
+            if run is not None:
+                mask &= chunk["run"] == run
+            selected.append(chunk[mask])
+        return numpy.concatenate(selected) if selected else numpy.empty(0, dtype=traceDtype)
+
+    def queueCurve(self, station, run):
+        """Queue length and teams in service at a station in one run, as step curves:
+        (times, queue lengths, teams in service), each value holding from its time to the next"""
+        records = self.select(station, run)
+        # At equal times, departures free a slot before the next start, and arrivals queue before they start
+        order = numpy.lexsort(((records["event"] + 1) % 3, records["time"]))
+        records = records[order]
+        queueSteps = numpy.select([records["event"] == enqueueEvent, records["event"] == startEvent], [1, -1], 0)
+        serviceSteps = numpy.select([records["event"] == startEvent, records["event"] == departEvent], [1, -1], 0)
+        return records["time"].astype(float), numpy.cumsum(queueSteps), numpy.cumsum(serviceSteps)
+
+    def meanQueueCurve(self, station, times):
+        """Mean queue length and mean no. of teams in service over all runs at a station, at the
+        given times: the events up to each time are counted over all runs at once"""
+        station = self.stationIndex(station)
+        times = numpy.asarray(times, dtype=float)
+        counts = numpy.zeros((3, len(times)))
+        for chunk in self.chunks():
+            chunk = chunk[chunk["station"] == station]
+            for event in (enqueueEvent, startEvent, departEvent):
+                eventTimes = numpy.sort(chunk["time"][chunk["event"] == event])
+                counts[event] += numpy.searchsorted(eventTimes, times, "right")
+        noOfRuns = max(self.noOfRuns, 1)
+        return (counts[enqueueEvent] - counts[startEvent]) / noOfRuns, (counts[startEvent] - counts[departEvent]) / noOfRuns
+
+    def occupancyIntegrals(self):
+        """Time integrals (team minutes) of the queue length and of the teams in service at each
+        station in each run, as two (runs x stations) arrays. The integral of the queue is the sum of
+        start times minus the sum of enqueue times, counting teams still queueing as starting at tEnd,
+        so the records do not need to be in time order"""
+        noOfStations = len(self.activityNames)
+        size = self.noOfRuns * noOfStations
+        sums = numpy.zeros((3, size)) # Sum of event times per event type and (run, station)
+        counts = numpy.zeros((3, size))
+        for chunk in self.chunks():
+            keys = chunk["run"].astype(numpy.int64) * noOfStations + chunk["station"]
+            for event in (enqueueEvent, startEvent, departEvent):
+                isEvent = chunk["event"] == event
+                sums[event] += numpy.bincount(keys[isEvent], chunk["time"][isEvent].astype(float), size)
+                counts[event] += numpy.bincount(keys[isEvent], minlength=size)
+        queueing = sums[startEvent] - sums[enqueueEvent] + (counts[enqueueEvent] - counts[startEvent]) * self.tEnd
+        serving = sums[departEvent] - sums[startEvent] + (counts[startEvent] - counts[departEvent]) * self.tEnd
+        return queueing.reshape(self.noOfRuns, noOfStations), serving.reshape(self.noOfRuns, noOfStations)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Shared fixtures and checks of the tests: python -m pytest from the top directory"""
+
+import contextlib
+import signal
+import numpy
+import pytest
+from flowsimulation.model import setupModel
+from flowsimulation.results import SimulationResults
+
+# (Teams, Activities) of the default course with the default number of teams
+def defaultScenario():
+    Teams, Activities, course = setupModel({"V": 27, "S": 14, "OB": 20})
+    return Teams, Activities
+
+@pytest.fixture
+def scenario():
+    return defaultScenario()
+
+# Check that two result sets hold the same runs
+def assertSameResults(results, expected):
+    assert results.noOfRuns == expected.noOfRuns
+    for name in SimulationResults.arrayNames:
+        numpy.testing.assert_array_equal(getattr(results, name), getattr(expected, name), err_msg=name)
+
+@contextlib.contextmanager
+def timeLimit(seconds):
+    """Fail with TimeoutError instead of hanging, e.g. on a worker pool that lost a task"""
+    def expire(signum, frame):
+        raise TimeoutError("Took more than %d seconds" % seconds)
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.alarm(seconds)
+    try:
+        yield
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""Analytic estimate of the queues"""
+
+import math
+from flowsimulation.analytic import analyticEstimate
+
+def test_estimate_of_teams_with_a_known_speed(scenario):
+    Teams, Activities = scenario
+    for t in Teams:
+        t.speedEstimate = (t.typeSpeed[0], 0.0)
+    estimates = analyticEstimate(Teams, Activities)
+    for estimate in estimates:
+        assert math.isfinite(estimate["wait"]) and math.isfinite(estimate["maxWait"])
+    assert sum(estimate["teams"] for estimate in estimates) > 0
+    assert all(estimate["open"] is not None for estimate in estimates if estimate["teams"])
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Runs spread over workers through a shared directory"""
+
+import os
+import threading
+import time
+from conftest import assertSameResults, defaultScenario, timeLimit
+from flowsimulation.distributed import WorkQueue, runDistributed, runWorker
+from flowsimulation.runner import runSimulations
+from flowsimulation.sampling import runSeeds
+
+def test_distributed_runs_equal_a_single_process(tmp_path):
+    directory = str(tmp_path)
+    workers = [threading.Thread(target=runWorker, args=(directory, "worker%d" % n), kwargs={"poll": 0.05})
+               for n in range(2)]
+    for worker in workers:
+        worker.start()
+    with timeLimit(120):
+        results = runDistributed(directory, [defaultScenario(), defaultScenario()], 25, engine="heap", unitSize=10,
+                                 timeout=60)
+        for worker in workers:
+            worker.join()
+    expected = runSimulations(*defaultScenario(), runSeeds(1, 0, 25), "heap")
+    for scenarioResults in results:
+        assertSameResults(scenarioResults, expected)
+
+def test_stale_claims_of_workers_on_hosts_with_dots(tmp_path):
+    queue = WorkQueue(str(tmp_path))
+    queue.submit([defaultScenario()], 20, engine="heap", unitSize=10)
+    unit = sorted(os.listdir(queue.path("todo")))[0]
+    claimPath = queue.path("claimed", "%s.node1.example.org-123" % unit)
+    os.rename(queue.path("todo", unit), claimPath)
+    queue.submit([defaultScenario()], 20, engine="heap", unitSize=10) # The claimed unit is not written again
+    assert unit not in os.listdir(queue.path("todo"))
+    os.utime(claimPath, (time.time() - 60, time.time() - 60))
+    assert queue.reissueStale(30) == 1
+    assert unit in os.listdir(queue.path("todo"))
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Engines: the same seeds give the same runs as the simpy engine, and checkpoints of the numpy engine"""
+
+import numpy
+import pytest
+from conftest import assertSameResults, defaultScenario
+from flowsimulation.engines import Checkpoint
+from flowsimulation.model import setupModel
+from flowsimulation.results import SimulationResults
+from flowsimulation.runner import runSimulations
+from flowsimulation.sampling import runSeeds
+
+@pytest.mark.parametrize("courseName", ["default", "rute2022"])
+@pytest.mark.parametrize("engine", ["heap", "numpy", "dynamic"])
+def test_engine_equals_simpy(engine, courseName):
+    seeds = runSeeds(1, 0, 20)
+    expected = runSimulations(*setupModel({"V": 27, "S": 14, "OB": 20}, None, courseName)[:2], seeds, "simpy")
+    results = runSimulations(*setupModel({"V": 27, "S": 14, "OB": 20}, None, courseName)[:2], seeds, engine)
+    for name in SimulationResults.arrayNames: # Times are summed in another order by some engines
+        numpy.testing.assert_allclose(getattr(results, name), getattr(expected, name), rtol=1e-9, atol=1e-6,
+                                      err_msg=name)
+
+# Resuming after changes to stations early and late in the course equals a run from scratch
+@pytest.mark.parametrize("changes", [{"capacity": 5}, {"minDuration": 12, "maxDuration": 16}])
+@pytest.mark.parametrize("station", [1, -2])
+def test_checkpoint_resume_equals_a_fresh_run(station, changes):
+    seeds = runSeeds(1, 0, 50)
+    checkpoint = Checkpoint()
+    Teams, Activities = defaultScenario()
+    runSimulations(Teams, Activities, seeds, "numpy", checkpoint)
+    for name, value in changes.items():
+        setattr(Activities[station], name, value)
+    results = runSimulations(Teams, Activities, seeds, "numpy", checkpoint)
+    Teams, Activities = defaultScenario()
+    for name, value in changes.items():
+        setattr(Activities[station], name, value)
+    assertSameResults(results, runSimulations(Teams, Activities, seeds, "numpy"))
+
+def test_checkpoint_without_changes_returns_the_same_runs():
+    seeds = runSeeds(1, 0, 50)
+    checkpoint = Checkpoint()
+    Teams, Activities = defaultScenario()
+    expected = runSimulations(Teams, Activities, seeds, "numpy", checkpoint)
+    assertSameResults(runSimulations(Teams, Activities, seeds, "numpy", checkpoint), expected)
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""Forecasts from check-ins"""
+
+import math
+from flowsimulation.forecasting import Forecaster
+
+def test_teams_without_check_ins_leave_the_start_after_now(scenario):
+    Teams, Activities = scenario
+    forecaster = Forecaster(Teams, Activities)
+    first = min(Teams, key=lambda t: t.startTime)
+    now = first.startTime + 120
+    forecast = forecaster.forecast(50, now=now)
+    fromStart = Forecaster(Teams, Activities).forecast(50, now=first.startTime)
+    for t in Teams:
+        if t.startTime < now - 60: # Not seen leaving the start for over an hour
+            assert forecast["teams"][t.index]["finish50"] >= fromStart["teams"][t.index]["finish50"] + 60
+
+def test_speed_estimate_of_a_known_speed(scenario):
+    Teams, Activities = scenario
+    team = Teams[0]
+    team.speedEstimate = (4.0, 0.0)
+    forecaster = Forecaster(Teams, Activities)
+    forecaster.observe([(team.name, team.route[3][1].name, team.startTime + 200, "leave")])
+    assert forecaster.speedEstimate(team) == (4.0, 0.0)
+    forecast = forecaster.forecast(20)
+    assert all(math.isfinite(row["finish50"]) for row in forecast["teams"])
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""Online statistics against the statistics of all runs"""
+
+import numpy
+from flowsimulation.model import tEnd
+from flowsimulation.results import OnlineResults
+from flowsimulation.runner import runSimulations
+from flowsimulation.sampling import runSeeds
+
+def test_online_end_times_match_all_runs(scenario):
+    Teams, Activities = scenario
+    Activities[-2].capacity = 1 # Some teams do not finish, and count as finishing at tEnd
+    online = OnlineResults(len(Teams), len(Activities))
+    endTimes = []
+    for firstRun in range(0, 1000, 100):
+        results = runSimulations(Teams, Activities, runSeeds(1, firstRun, 100), "numpy")
+        online.update(results)
+        endTimes.append(results.endTime)
+    endTimes = numpy.concatenate(endTimes)
+    assert 0.05 < numpy.mean(endTimes == 0) < 0.9
+    endTimes = numpy.where(endTimes == 0, tEnd, endTimes)
+    numpy.testing.assert_allclose(online.mean("endTime"), endTimes.mean(axis=0))
+    # P-square estimates are within a few percentiles (or a minute) of the exact ones
+    estimates = online.quantiles("endTime")
+    for column, (p, low, high) in enumerate([(5, 2, 8), (95, 92, 98)]):
+        assert numpy.all(estimates[:, column] >= numpy.percentile(endTimes, low, axis=0) - 1), p
+        assert numpy.all(estimates[:, column] <= numpy.percentile(endTimes, high, axis=0) + 1), p
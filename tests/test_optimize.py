@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""Search for start schedules"""
+
+from conftest import timeLimit
+from flowsimulation.optimize import optimizeStart, sampleCandidates, startSpace
+
+def test_sample_candidates_of_a_small_space():
+    axes = startSpace(shift=0, maxSimul=4, intervals=(15,))
+    with timeLimit(10):
+        candidates = sampleCandidates(axes, 100)
+    assert len(candidates) == 4 ** 3
+    assert len({tuple(sorted(c.items())) for c in candidates}) == len(candidates)
+
+def test_current_start_follows_the_overrides():
+    overrides = {"groupStartTimes.V": 500, "tStartInterval": 10}
+    current = sampleCandidates(startSpace(overrides=overrides), 5, overrides=overrides)[0]
+    assert current["groupStartTimes.V"] == 500 and current["tStartInterval"] == 10
+    assert 500 in startSpace(overrides=overrides)["groupStartTimes.V"]
+
+def test_optimize_start_terminates():
+    axes = {"tStartInterval": [10, 15, 20], "tStartSimul.V": [2, 3]}
+    with timeLimit(60):
+        result = optimizeStart(40, 27, 14, 20, noOfCandidates=8, screeningRuns=10, axes=axes)
+    assert [r["candidates"] for r in result["rounds"]] == [7, 4, 2]
+    assert result["best"]["objective"] <= result["current"]["objective"]
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Result storage: cached and stored runs"""
+
+import numpy
+import pytest
+from conftest import assertSameResults, defaultScenario
+from flowsimulation.results import ResultCache, ResultStore, SimulationResults
+from flowsimulation.runner import runCached, runScenario, runSimulations
+from flowsimulation.sampling import runSeeds
+
+def test_cache_resume_equals_a_full_run(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    runCached(cache, *defaultScenario(), 10, engine="heap")
+    results = runCached(cache, *defaultScenario(), 25, engine="heap")
+    assertSameResults(results, runSimulations(*defaultScenario(), runSeeds(1, 0, 25), "heap"))
+    assertSameResults(runCached(cache, *defaultScenario(), 15, engine="heap"), results.firstRuns(15))
+
+def test_cache_keeps_scenarios_apart(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    runCached(cache, *defaultScenario(), 10, engine="heap")
+    Teams, Activities = defaultScenario()
+    Activities[3].capacity += 2
+    assertSameResults(runCached(cache, Teams, Activities, 10, engine="heap"),
+                      runSimulations(Teams, Activities, runSeeds(1, 0, 10), "heap"))
+
+# Runs of a scenario appended to store in batches of 10, as simulate(store=...) does
+def runStored(store, Teams, Activities, noOfRuns):
+    return runScenario(Teams, Activities, noOfRuns, 1, 1, "heap", False, 10, None, 0.95, None, None, None, "plain",
+                       None, store=store)
+
+def test_store_resume_equals_a_full_run(tmp_path):
+    runStored(ResultStore(str(tmp_path)), *defaultScenario(), 20)
+    Teams, Activities = defaultScenario()
+    results = runStored(ResultStore(str(tmp_path)), Teams, Activities, 35)
+    expected = runSimulations(Teams, Activities, runSeeds(1, 0, 35), "heap")
+    assert results.noOfRuns == 35
+    for name in SimulationResults.arrayNames:
+        if name != "waits": # Only kept as sums per team, see StoredResults
+            numpy.testing.assert_array_equal(getattr(results, name), getattr(expected, name), err_msg=name)
+    for t in Teams:
+        assert results.waitSumSummary(t) == pytest.approx(expected.waitSumSummary(t))
+    for a in Activities:
+        numpy.testing.assert_array_equal(results.teamsArrived(a), expected.teamsArrived(a))
+
+def test_store_refuses_another_scenario(tmp_path):
+    runStored(ResultStore(str(tmp_path)), *defaultScenario(), 10)
+    Teams, Activities = defaultScenario()
+    Activities[3].capacity += 2
+    with pytest.raises(ValueError):
+        runStored(ResultStore(str(tmp_path)), Teams, Activities, 10)
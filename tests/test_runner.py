@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Running simulations: worker processes and confidence intervals"""
+
+import pytest
+from conftest import assertSameResults, defaultScenario, timeLimit
+from flowsimulation.cli import parseArguments
+from flowsimulation.runner import runBatch, tQuantile, parameterGrid, sweep
+from flowsimulation.sampling import runSeeds
+
+def test_results_do_not_depend_on_workers():
+    seeds = runSeeds(1, 0, 8)
+    expected = runBatch(*defaultScenario(), seeds, 1, "simpy")
+    for workers in (2, 3):
+        with timeLimit(60):
+            assertSameResults(runBatch(*defaultScenario(), seeds, workers, "simpy"), expected)
+
+def test_parallel_after_serial_runs_on_the_same_scenario(scenario):
+    Teams, Activities = scenario
+    seeds = runSeeds(1, 0, 8)
+    expected = runBatch(Teams, Activities, seeds, 1, "simpy")
+    with timeLimit(60):
+        assertSameResults(runBatch(Teams, Activities, seeds, 2, "simpy"), expected)
+
+# Two-sided 95% values from a table of Student's t distribution
+@pytest.mark.parametrize("degreesOfFreedom, expected", [(1, 12.706), (2, 4.303), (3, 3.182), (5, 2.571),
+                                                        (10, 2.228), (30, 2.042), (60, 2.000), (1000, 1.962)])
+def test_t_quantile(degreesOfFreedom, expected):
+    assert tQuantile(0.975, degreesOfFreedom) == pytest.approx(expected, abs=1e-3)
+
+def test_vary_sweeps_the_grid_with_the_overrides_of_set():
+    args = parseArguments(["--vary", "capacity.Post 9=4,6", "--vary", "tStartInterval=10,15",
+                           "--set", "capacity.Post 1=3"])
+    variants = parameterGrid(dict(args.vary))
+    assert variants[1] == {"capacity.Post 9": 4, "tStartInterval": 15} and len(variants) == 4
+    rows = sweep(variants[:2], 10, 27, 14, 20, overrides=dict(args.set))
+    assert [row["variant"] for row in rows] == variants[:2]
+    expected = sweep([dict(variants[1], **dict(args.set))], 10, 27, 14, 20)
+    assert (rows[1]["totalWaits"] == expected[0]["totalWaits"]).all()
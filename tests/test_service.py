@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Simulation service: summaries, shared computations and errors"""
+
+import asyncio
+import json
+import numpy
+import pytest
+from conftest import defaultScenario, timeLimit
+from flowsimulation.model import tEnd
+from flowsimulation.runner import runSimulations
+from flowsimulation.sampling import runSeeds
+from flowsimulation.service import RunningSummary, Service
+
+def test_running_summary_is_within_a_minute_of_the_runs():
+    Teams, Activities = defaultScenario()
+    results = runSimulations(Teams, Activities, runSeeds(1, 0, 300), "numpy")
+    running = RunningSummary(300, Activities)
+    for firstRun in (200, 0, 100): # Batches may finish in any order
+        running.update(firstRun, runSimulations(Teams, Activities, runSeeds(1, firstRun, 100), "numpy"))
+    summary = running.summary()
+    totalWaits = numpy.nansum(results.waits, axis=(1, 2))
+    numpy.testing.assert_array_equal(running.totalWaits, totalWaits)
+    assert summary["runs"] == 300
+    assert summary["totalWait"] == pytest.approx(totalWaits.mean())
+    assert abs(summary["totalWait95"] - numpy.percentile(totalWaits, 95)) < 1
+    finish = numpy.where(results.endTime == 0, tEnd, results.endTime)
+    for p in (50, 95):
+        assert abs(summary["finish%d" % p] - numpy.percentile(finish, p)) < 1
+    for a, row in zip(Activities, summary["activities"]):
+        open5, close95 = results.startCloseTime(a)
+        assert abs(row["open5"] - open5) < 1 and abs(row["close95"] - close95) < 1
+        assert row["maxQueue"] == pytest.approx(results.maxQueues(a).mean())
+
+# Replies to request lines sent at once to service, by request id
+async def ask(service, *lines):
+    replies = {}
+    async def send(message, requestId):
+        replies.setdefault(requestId, []).append(message)
+    await asyncio.gather(*(service.handle(line, send) for line in lines))
+    return replies
+
+def test_service_shares_computations_and_answers_errors():
+    async def main():
+        service = Service(1, firstBatch=20, batchSize=40)
+        try:
+            request = {"runs": 100, "overrides": {"capacity.Post 9": 6}}
+            replies = await ask(service, json.dumps(dict(request, id=1)), json.dumps(dict(request, id=2)),
+                                json.dumps({"id": 3, "runz": 5}), "[1]",
+                                json.dumps({"id": 4, "runs": 10, "course": "no such course"}))
+            assert len(service.computations) == 1 # Requests 1 and 2 shared one
+            assert replies[1][-1]["type"] == replies[2][-1]["type"] == "result"
+            assert replies[1][-1]["summary"] == replies[2][-1]["summary"]
+            assert replies[1][-1]["summary"]["runs"] == 100
+            assert [m["summary"]["runs"] for m in replies[1][:-1]] == [20, 60]
+            assert replies[3] == [{"type": "error", "message": "ValueError: unknown fields: runz"}]
+            assert replies[None][0]["type"] == "error" and replies[4][0]["type"] == "error"
+            again = await ask(service, json.dumps(dict(request, id=5)))
+            assert again[5] == [dict(replies[1][-1], cached=True, seconds=again[5][0]["seconds"])]
+            sweep = await ask(service, json.dumps({"id": 6, "type": "sweep", "runs": 100,
+                                                   "variants": [{}, {"capacity.Post 9": 6}]}))
+            rows = sweep[6][-1]["rows"]
+            assert rows[1]["totalWait"] == pytest.approx(replies[1][-1]["summary"]["totalWait"])
+            assert rows[0]["waitDifference"] == 0
+        finally:
+            service.pool.shutdown(cancel_futures=True)
+    with timeLimit(120):
+        asyncio.run(main())
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Queue traces: the integrals of the records match the occupancy arrays of the runs"""
+
+import numpy
+import pytest
+from conftest import defaultScenario
+from flowsimulation.results import SimulationResults
+from flowsimulation.runner import runSimulations
+from flowsimulation.sampling import runSeeds
+from flowsimulation.trace import Trace, TraceWriter
+
+@pytest.mark.parametrize("engine", ["simpy", "heap", "dynamic", "numpy"])
+def test_trace_integrals_match_occupancy(engine, tmp_path):
+    seeds = runSeeds(1, 0, 10)
+    Teams, Activities = defaultScenario()
+    with TraceWriter(str(tmp_path / "trace.bin"), Activities, len(Teams)) as trace:
+        # Two batches, so the runs of the second are numbered on from the first
+        results = runSimulations(Teams, Activities, seeds[:4], engine, trace=trace)
+        results.extend(runSimulations(Teams, Activities, seeds[4:], engine, trace=trace))
+    queueing, serving = Trace(str(tmp_path / "trace.bin")).occupancyIntegrals()
+    # The records hold times as float32
+    numpy.testing.assert_allclose(queueing, results.queueTime, rtol=1e-5, atol=0.05)
+    numpy.testing.assert_allclose(serving, results.busyTime, rtol=1e-5, atol=0.05)
+
+@pytest.mark.parametrize("engine", ["simpy", "heap", "numpy"])
+def test_trace_does_not_change_results(engine, tmp_path):
+    seeds = runSeeds(1, 0, 10)
+    expected = runSimulations(*defaultScenario(), seeds, engine)
+    Teams, Activities = defaultScenario()
+    with TraceWriter(str(tmp_path / "trace.bin"), Activities, len(Teams)) as trace:
+        results = runSimulations(Teams, Activities, seeds, engine, trace=trace)
+    for name in SimulationResults.arrayNames: # Traced heap runs sum the times in another order
+        numpy.testing.assert_allclose(getattr(results, name), getattr(expected, name), rtol=1e-9, atol=1e-6,
+                                      err_msg=name)